@@ -1,4 +1,4 @@
 """AI Agent package for LangGraph workflow."""
-from agent.workflow import create_agent
+from agent.workflow import arun_for_users, create_agent
 
-__all__ = ["create_agent"]
+__all__ = ["create_agent", "arun_for_users"]
@@ -0,0 +1,74 @@
+"""Near-duplicate article detection (same story, different URL)."""
+import logging
+import re
+from typing import Any, Dict, List
+import numpy as np
+import xxhash
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class NearDuplicateFilter:
+    """
+    Drops articles whose title and lead text nearly match an article already kept.
+    
+    Articles are embedded as hashed bag-of-words vectors, so similarity is one
+    matrix product per batch. State is kept across calls, so a filter instance
+    covers a whole run even when articles arrive in several batches.
+    """
+    
+    def __init__(self, threshold: float = 0.9, dims: int = 4096):
+        """
+        Initialize an empty filter.
+        
+        Args:
+            threshold: Cosine similarity at or above which two articles are duplicates
+            dims: Width of the hashed term vectors
+        """
+        self.threshold = threshold
+        self.dims = dims
+        self._kept = np.zeros((0, dims), dtype=np.float32)
+    
+    def _vectorize(self, articles: List[Dict[str, Any]]) -> np.ndarray:
+        """Return L2-normalized hashed term-frequency vectors, one row per article."""
+        matrix = np.zeros((len(articles), self.dims), dtype=np.float32)
+        for row, article in enumerate(articles):
+            text = f"{article.get('title', '')} {(article.get('content') or '')[:500]}".lower()
+            columns = [xxhash.xxh3_64_intdigest(token.encode()) % self.dims for token in _TOKEN_RE.findall(text)]
+            np.add.at(matrix[row], columns, 1.0)
+        
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+    
+    def filter(self, articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Keep the best-scored article of each near-duplicate group.
+        
+        Args:
+            articles: Articles to check (against each other and earlier batches)
+        
+        Returns:
+            Surviving articles, in their original order
+        """
+        if not articles:
+            return []
+        
+        vectors = self._vectorize(articles)
+        near_kept = (vectors @ self._kept.T >= self.threshold).any(axis=1)
+        near_each_other = vectors @ vectors.T >= self.threshold
+        
+        # Greedy by Tavily relevance score: the first article of a group wins
+        order = sorted(range(len(articles)), key=lambda i: articles[i].get("score") or 0.0, reverse=True)
+        keep: List[int] = []
+        for i in order:
+            if near_kept[i] or near_each_other[i, keep].any():
+                logger.debug(f"Article near-duplicate: {articles[i].get('title', '')[:50]}")
+                continue
+            keep.append(i)
+        keep.sort()
+        
+        self._kept = np.vstack([self._kept, vectors[keep]])
+        return [articles[i] for i in keep]
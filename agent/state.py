@@ -1,23 +1,25 @@
 """State management and schemas for the LangGraph agent."""
-from typing import TypedDict, List, Dict, Any, Optional
+from dataclasses import dataclass, field
+from typing import List, Dict, Any
 
 
-class AgentState(TypedDict):
+@dataclass(slots=True)
+class AgentState:
     """State schema for the LangGraph agent workflow."""
     
     # User information
-    user_email: str
-    user_preferences: Dict[str, Any]  # topics, timezone, schedule_time
+    user_email: str = ""
+    user_preferences: Dict[str, Any] = field(default_factory=dict)  # topics, timezone, schedule_time
     
     # Workflow data
-    search_queries: List[str]
-    articles: List[Dict[str, Any]]  # Raw articles from Tavily
-    deduplicated_articles: List[Dict[str, Any]]  # After deduplication
-    summaries: List[Dict[str, Any]]  # Article + summary pairs
-    email_content: str
+    search_queries: List[str] = field(default_factory=list)
+    articles: List[Dict[str, Any]] = field(default_factory=list)  # Raw articles from Tavily
+    deduplicated_articles: List[Dict[str, Any]] = field(default_factory=list)  # After deduplication
+    summaries: List[Dict[str, Any]] = field(default_factory=list)  # Article + summary pairs
+    email_content: str = ""
     
     # Error handling
-    errors: List[str]
+    errors: List[str] = field(default_factory=list)
     
     # Metadata
-    metadata: Dict[str, Any]  # execution time, API usage, etc.
+    metadata: Dict[str, Any] = field(default_factory=dict)  # execution time, API usage, etc.
@@ -0,0 +1,30 @@
+"""Shared AWS session and client settings for the AWS-backed tools."""
+import threading
+from typing import Optional
+import boto3
+from botocore.config import Config
+from config import config
+
+# Sized for concurrent BatchGetItem/BatchWriteItem and bulk SES sends
+CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'max_attempts': 3, 'mode': 'adaptive'},
+)
+
+# One session per process, so credentials are resolved once for every client
+_SESSION: Optional[boto3.Session] = None
+_SESSION_LOCK = threading.Lock()
+
+
+def get_session() -> boto3.Session:
+    """Return the shared boto3 session, creating it on first use."""
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                _SESSION = boto3.Session(
+                    aws_access_key_id=config.AWS_ACCESS_KEY_ID or None,
+                    aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY or None,
+                    region_name=config.AWS_REGION,
+                )
+    return _SESSION
@@ -1,13 +1,31 @@
 """Calendar tool for timezone-aware scheduling validation."""
 import logging
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional
-import pytz
+from zoneinfo import ZoneInfo
 from config import config
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=512)
+def _tz(name: str) -> ZoneInfo:
+    """Return a cached ZoneInfo for a timezone name."""
+    return ZoneInfo(name)
+
+
+@lru_cache(maxsize=512)
+def _minute_of_day(schedule_time: str) -> int:
+    """Return minutes since midnight for an "HH:MM" string (parsed once per distinct value)."""
+    hour, minute = map(int, schedule_time.split(":"))
+    return hour * 60 + minute
+
+
+# Default to IST (Indian Standard Time)
+_DEFAULT_TZ = _tz('Asia/Kolkata')
+
+
 class CalendarTool:
     """Tool for timezone-aware datetime operations and scheduling validation."""
     
@@ -26,12 +44,10 @@ class CalendarTool:
             Current datetime in specified timezone
         """
         try:
-            tz = pytz.timezone(timezone)
-            return datetime.now(tz)
+            return datetime.now(_tz(timezone))
         except Exception as e:
             logger.error(f"Invalid timezone '{timezone}': {str(e)}")
-            # Default to IST (Indian Standard Time)
-            return datetime.now(pytz.timezone('Asia/Kolkata'))
+            return datetime.now(_DEFAULT_TZ)
     
     def validate_send_time(
         self, 
@@ -54,21 +70,15 @@ class CalendarTool:
             # Get current time in user's timezone
             current_time = self.get_current_time_in_timezone(user_timezone)
             
-            # Parse schedule time
-            hour, minute = map(int, schedule_time.split(":"))
-            
-            # Create scheduled datetime for today
-            tz = pytz.timezone(user_timezone)
-            scheduled_time = current_time.replace(hour=hour, minute=minute, second=0, microsecond=0)
-            
-            # Calculate time difference
-            time_diff = abs((current_time - scheduled_time).total_seconds() / 60)
+            # Compare minutes since midnight instead of building a scheduled datetime
+            current_minutes = current_time.hour * 60 + current_time.minute + current_time.second / 60
+            time_diff = abs(current_minutes - _minute_of_day(schedule_time))
             
             # Check if within tolerance
             is_valid = time_diff <= tolerance_minutes
             
             logger.info(
-                f"Time validation: current={current_time.strftime('%H:%M')}, "
+                f"Time validation: current={current_time.hour:02d}:{current_time.minute:02d}, "
                 f"scheduled={schedule_time}, diff={time_diff:.1f}min, valid={is_valid}"
             )
             
@@ -1,72 +1,332 @@
-"""Database tool for DynamoDB operations (mock implementation for Day 1-2)."""
-import hashlib
+"""Database tool for DynamoDB operations (in-memory mock unless DYNAMODB_ENABLED)."""
 import logging
-from typing import Dict, Any, Optional
-from datetime import datetime
+import mmap
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Dict, Any, List, Optional, Set, Tuple
+import xxhash
+from pyroaring import BitMap64
+from agent.tools.aws import CLIENT_CONFIG, get_session
 from config import config
 
 logger = logging.getLogger(__name__)
 
+# Process-wide DynamoDB resource shared by all DatabaseTool instances
+_DYNAMODB_RESOURCE: Optional[Any] = None
+_DYNAMODB_LOCK = threading.Lock()
+
+# BatchGetItem resubmissions of UnprocessedKeys (throttling): full-jitter exponential backoff
+_BATCH_GET_MAX_ATTEMPTS = 8
+_BATCH_GET_BACKOFF_BASE = 0.05  # seconds
+_BATCH_GET_BACKOFF_CAP = 2.0  # seconds
+
+
+def _get_dynamodb_resource() -> Any:
+    """Return the shared DynamoDB resource, creating it on first use."""
+    global _DYNAMODB_RESOURCE
+    if _DYNAMODB_RESOURCE is None:
+        with _DYNAMODB_LOCK:
+            if _DYNAMODB_RESOURCE is None:
+                _DYNAMODB_RESOURCE = get_session().resource('dynamodb', config=CLIENT_CONFIG)
+    return _DYNAMODB_RESOURCE
+
+
+def _article_hash(article: Dict[str, Any]) -> int:
+    """Hash title + url for deduplication (non-cryptographic, only used as a lookup key)."""
+    return xxhash.xxh3_64_intdigest(f"{article.get('title', '')}\x1f{article.get('url', '')}".encode())
+
+
+def _article_id_hash(article_id: str) -> int:
+    """Compact exact key for an article id in the in-memory sent history."""
+    return xxhash.xxh3_64_intdigest(article_id.encode())
+
 
 class DatabaseTool:
-    """Tool for database operations (mock for Day 1-2, real DynamoDB in Day 3)."""
+    """Tool for database operations (in-memory mock, or DynamoDB when enabled)."""
     
-    def __init__(self):
-        """Initialize database tool with in-memory storage for Day 1-2."""
-        # In-memory storage (will be replaced with DynamoDB in Day 3)
-        self.article_hashes: Dict[str, datetime] = {}  # hash -> timestamp
-        self.user_history: Dict[str, set] = {}  # user_email -> set of article_ids
+    def __init__(self, hashes_path: Optional[str] = None):
+        """
+        Initialize database tool with in-memory storage or DynamoDB tables.
         
-        logger.info("DatabaseTool initialized with in-memory storage (mock)")
+        Args:
+            hashes_path: File that keeps in-memory article hashes across runs
+                (defaults to config.ARTICLE_HASHES_PATH; empty disables it)
+        """
+        # In-memory storage (used when DynamoDB is not enabled)
+        self.article_hashes: Dict[int, int] = {}  # hash -> stored-at timestamp (ns since epoch)
+        self.hashes_path = config.ARTICLE_HASHES_PATH if hashes_path is None else hashes_path
+        self._persisted_hashes = BitMap64()  # hashes stored by this and earlier runs
+        self._persisted_dirty = False  # stored since the last flush()
+        self._flush_lock = threading.Lock()  # store nodes of concurrent users may flush at once
+        # user_email -> xxh3 of sent article_ids: the exact in-memory history, or on
+        # DynamoDB the ids this process has written or seen confirmed
+        self.user_history: Dict[str, Set[int]] = {}
+        
+        # DynamoDB article hashes this process has written or seen confirmed; other
+        # hashes are looked up in the table (no upfront scan of news_articles)
+        self._known_hashes: Set[int] = set()
+        
+        self.dynamodb = None
+        self.articles_table = None
+        self.user_summaries_table = None
+        self.use_dynamodb = False
+        
+        if config.DYNAMODB_ENABLED:
+            try:
+                self.dynamodb = _get_dynamodb_resource()
+                self.articles_table = self.dynamodb.Table(config.DYNAMODB_NEWS_ARTICLES_TABLE)
+                self.user_summaries_table = self.dynamodb.Table(config.DYNAMODB_USER_SUMMARIES_TABLE)
+                self.use_dynamodb = True
+                logger.info("DatabaseTool initialized with DynamoDB")
+            except Exception as e:
+                logger.warning(f"Failed to initialize DynamoDB: {str(e)}")
+        
+        if not self.use_dynamodb:
+            logger.info("DatabaseTool initialized with in-memory storage (mock)")
+            if self.hashes_path:
+                self._load_persisted_hashes()
     
-    def _generate_article_hash(self, article: Dict[str, Any]) -> str:
+    def _generate_article_hash(self, article: Dict[str, Any]) -> int:
         """Generate hash for article deduplication."""
-        # Use title + url for hash
-        content = f"{article.get('title', '')}{article.get('url', '')}"
-        return hashlib.sha256(content.encode()).hexdigest()
+        return _article_hash(article)
+    
+    def _load_persisted_hashes(self) -> None:
+        """Load article hashes saved by earlier runs."""
+        if not os.path.exists(self.hashes_path) or os.path.getsize(self.hashes_path) == 0:
+            return
+        
+        try:
+            with open(self.hashes_path, "rb") as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                self._persisted_hashes = BitMap64.deserialize(data)
+        except Exception as e:
+            logger.warning(f"Failed to load article hashes from {self.hashes_path}: {str(e)}")
+            return
+        
+        logger.info(f"Loaded {len(self._persisted_hashes)} article hashes from {self.hashes_path}")
+    
+    def flush(self) -> None:
+        """
+        Write article hashes stored since the last flush to hashes_path.
+        
+        Stores only buffer in memory; call this once per run (the workflow's
+        store node does). The file is replaced atomically via a unique temp
+        file, and concurrent flushes are serialized.
+        """
+        if not self.hashes_path:
+            return
+        
+        with self._flush_lock:
+            if not self._persisted_dirty:
+                return
+            
+            # Cleared first, so hashes stored while writing mark the file dirty again
+            self._persisted_dirty = False
+            temp_path = None
+            try:
+                fd, temp_path = tempfile.mkstemp(
+                    dir=os.path.dirname(os.path.abspath(self.hashes_path)),
+                    prefix=f"{os.path.basename(self.hashes_path)}.",
+                    suffix=".tmp",
+                )
+                with os.fdopen(fd, "wb") as f:
+                    f.write(self._persisted_hashes.serialize())
+                os.replace(temp_path, self.hashes_path)
+            except OSError as e:
+                logger.error(f"Failed to save article hashes to {self.hashes_path}: {str(e)}")
+                self._persisted_dirty = True
+                if temp_path and os.path.exists(temp_path):
+                    os.remove(temp_path)
     
-    def check_article_hash(self, hash: str) -> bool:
+    def _is_stored_in_memory(self, hash: int) -> bool:
+        """Check the in-memory store, including hashes persisted by earlier runs."""
+        return hash in self.article_hashes or hash in self._persisted_hashes
+    
+    def check_article_hash(self, hash: int) -> bool:
         """
         Check if article hash exists (article-level deduplication).
         
         Args:
-            hash: Article hash string
-            
+            hash: Article hash (64-bit integer)
+        
         Returns:
             True if article exists, False otherwise
         """
-        exists = hash in self.article_hashes
-        logger.debug(f"Article hash check: {hash[:16]}... exists={exists}")
+        if self.use_dynamodb:
+            exists = hash in self._known_hashes
+            if not exists:
+                response = self.articles_table.get_item(
+                    Key={"article_hash": hash},
+                    ProjectionExpression="article_hash"
+                )
+                exists = "Item" in response
+                if exists:
+                    self._known_hashes.add(hash)
+        else:
+            exists = self._is_stored_in_memory(hash)
+        logger.debug(f"Article hash check: {hash!r} exists={exists}")
         return exists
     
+    def check_article_hashes(self, hashes: List[int]) -> List[bool]:
+        """
+        Check many article hashes at once (BatchGetItem on DynamoDB).
+        
+        Args:
+            hashes: Article hashes (64-bit integers)
+        
+        Returns:
+            List of flags, True where the article already exists
+        """
+        if self.use_dynamodb:
+            # One BatchGetItem for everything this process has not written or confirmed
+            unknown = list({h for h in hashes if h not in self._known_hashes})
+            if unknown:
+                items = self._batch_get(
+                    self.articles_table,
+                    [{"article_hash": h} for h in unknown],
+                    "article_hash"
+                )
+                self._known_hashes.update(int(item["article_hash"]) for item in items)
+            return [h in self._known_hashes for h in hashes]
+        
+        return [self._is_stored_in_memory(h) for h in hashes]
+    
+    def _batch_get(self, table: Any, keys: List[Dict[str, Any]], projection: str) -> List[Dict[str, Any]]:
+        """
+        Fetch items by key with BatchGetItem (100 keys per request).
+        
+        Unprocessed keys are resubmitted with capped, jittered exponential
+        backoff; if any remain after _BATCH_GET_MAX_ATTEMPTS the lookup fails
+        rather than reporting those keys as missing.
+        """
+        items = []
+        for start in range(0, len(keys), 100):
+            request = {table.name: {
+                "Keys": keys[start:start + 100],
+                "ProjectionExpression": projection,
+            }}
+            for attempt in range(_BATCH_GET_MAX_ATTEMPTS):
+                if attempt:
+                    time.sleep(random.uniform(
+                        0, min(_BATCH_GET_BACKOFF_CAP, _BATCH_GET_BACKOFF_BASE * 2 ** attempt)
+                    ))
+                response = self.dynamodb.batch_get_item(RequestItems=request)
+                items.extend(response["Responses"].get(table.name, []))
+                request = response.get("UnprocessedKeys")
+                if not request:
+                    break
+            else:
+                unprocessed = len(request[table.name]["Keys"])
+                raise RuntimeError(
+                    f"BatchGetItem left {unprocessed} keys unprocessed after {_BATCH_GET_MAX_ATTEMPTS} attempts"
+                )
+        return items
+    
     def check_user_history(self, user_email: str, article_id: str) -> bool:
         """
         Check if user has already received this article (user-level deduplication).
         
+        In memory, the exact sent-id set is authoritative. On DynamoDB, ids not
+        already known to this process are looked up with GetItem (the user's
+        full history is never loaded).
+        
         Args:
             user_email: User email address
             article_id: Article identifier (hash or URL)
-            
+        
         Returns:
             True if user has already received this article, False otherwise
         """
-        if user_email not in self.user_history:
-            return False
-        
-        exists = article_id in self.user_history[user_email]
+        if self.use_dynamodb:
+            key = _article_id_hash(article_id)
+            exists = key in self.user_history.get(user_email, ())
+            if not exists:
+                response = self.user_summaries_table.get_item(
+                    Key={"user_email": user_email, "article_id": article_id},
+                    ProjectionExpression="article_id"
+                )
+                exists = "Item" in response
+                if exists:
+                    self.user_history.setdefault(user_email, set()).add(key)
+        else:
+            exists = _article_id_hash(article_id) in self.user_history.get(user_email, ())
         logger.debug(f"User history check: {user_email} - {article_id[:16]}... exists={exists}")
         return exists
     
-    def store_article(self, article: Dict[str, Any], hash: str) -> None:
+    def check_user_history_batch(self, user_email: str, article_ids: List[str]) -> List[bool]:
+        """
+        Check many articles against a user's sent history at once.
+        
+        On DynamoDB, ids not already known to this process are resolved with
+        one BatchGetItem; in memory, the exact sent-id set answers directly.
+        
+        Args:
+            user_email: User email address
+            article_ids: Article identifiers (hash or URL)
+        
+        Returns:
+            List of flags, True where the user has already received the article
+        """
+        if self.use_dynamodb:
+            sent_ids = self.user_history.setdefault(user_email, set())
+            unknown = list({a for a in article_ids if _article_id_hash(a) not in sent_ids})
+            if unknown:
+                items = self._batch_get(
+                    self.user_summaries_table,
+                    [{"user_email": user_email, "article_id": a} for a in unknown],
+                    "article_id"
+                )
+                sent_ids.update(_article_id_hash(item["article_id"]) for item in items)
+            return [_article_id_hash(a) in sent_ids for a in article_ids]
+        
+        sent_ids = self.user_history.get(user_email, ())
+        return [_article_id_hash(a) in sent_ids for a in article_ids]
+    
+    def store_article(self, article: Dict[str, Any], hash: int) -> None:
         """
         Store article hash in database.
         
         Args:
             article: Article dictionary
-            hash: Article hash string
+            hash: Article hash (64-bit integer)
+        """
+        self.store_articles_batch([(hash, article)])
+    
+    def store_articles_batch(self, items: List[Tuple[int, Dict[str, Any]]]) -> None:
+        """
+        Store many article hashes at once (BatchWriteItem on DynamoDB).
+        
+        Args:
+            items: List of (article hash, article dict) pairs
         """
-        self.article_hashes[hash] = datetime.utcnow()
-        logger.info(f"Stored article hash: {hash[:16]}...")
+        if not items:
+            return
+        
+        if self.use_dynamodb:
+            stored_at = int(time.time())
+            # batch_writer chunks into 25-item BatchWriteItem calls and retries UnprocessedItems
+            with self.articles_table.batch_writer(overwrite_by_pkeys=["article_hash"]) as batch:
+                for hash, article in items:
+                    batch.put_item(Item={
+                        "article_hash": hash,
+                        "title": article.get("title") or "",
+                        "url": article.get("url") or "",
+                        "stored_at": stored_at,
+                    })
+            self._known_hashes.update(hash for hash, _ in items)
+        else:
+            stored_at = time.time_ns()
+            for hash, _ in items:
+                self.article_hashes[hash] = stored_at
+            if self.hashes_path:
+                # Written to disk by flush(), not on every batch
+                self._persisted_hashes.update(hash for hash, _ in items)
+                self._persisted_dirty = True
+        
+        logger.info(f"Stored {len(items)} article hashes")
     
     def mark_sent_to_user(self, user_email: str, article_id: str) -> None:
         """
@@ -76,20 +336,56 @@ class DatabaseTool:
             user_email: User email address
             article_id: Article identifier
         """
-        if user_email not in self.user_history:
-            self.user_history[user_email] = set()
+        self.mark_sent_batch(user_email, [article_id])
+    
+    def mark_sent_batch(self, user_email: str, article_ids: List[str]) -> None:
+        """
+        Mark many articles as sent to a user at once (BatchWriteItem on DynamoDB).
+        
+        Args:
+            user_email: User email address
+            article_ids: Article identifiers
+        """
+        if not article_ids:
+            return
+        
+        if self.use_dynamodb:
+            sent_at = int(time.time())
+            with self.user_summaries_table.batch_writer(
+                overwrite_by_pkeys=["user_email", "article_id"]
+            ) as batch:
+                for article_id in article_ids:
+                    batch.put_item(Item={
+                        "user_email": user_email,
+                        "article_id": article_id,
+                        "sent_at": sent_at,
+                    })
         
-        self.user_history[user_email].add(article_id)
-        logger.info(f"Marked article {article_id[:16]}... as sent to {user_email}")
+        self.user_history.setdefault(user_email, set()).update(
+            _article_id_hash(article_id) for article_id in article_ids
+        )
+        logger.info(f"Marked {len(article_ids)} articles as sent to {user_email}")
     
-    def get_article_hash(self, article: Dict[str, Any]) -> str:
+    def get_article_hashes(self, articles: List[Dict[str, Any]]) -> List[int]:
+        """
+        Generate hashes for many articles in one pass.
+        
+        Args:
+            articles: List of article dictionaries
+        
+        Returns:
+            Article hashes, in the same order as articles
+        """
+        return [_article_hash(article) for article in articles]
+    
+    def get_article_hash(self, article: Dict[str, Any]) -> int:
         """
         Generate and return article hash.
         
         Args:
             article: Article dictionary
-            
+        
         Returns:
-            Article hash string
+            Article hash (64-bit xxh3 integer)
         """
         return self._generate_article_hash(article)
@@ -1,50 +1,156 @@
 """Groq LLM tool for query analysis, summarization, and email generation."""
-import time
+import asyncio
+import functools
 import logging
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+import groq
+import httpx
+import jinja2
+import orjson
 from langchain_groq import ChatGroq
 from langchain_core.messages import HumanMessage, SystemMessage
+from pydantic import BaseModel, Field
+from tenacity import (
+    AsyncRetrying,
+    Retrying,
+    RetryCallState,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
 from config import config
 
 logger = logging.getLogger(__name__)
 
+# Transient failures worth retrying; auth/validation errors fail fast
+_RETRYABLE_ERRORS = (
+    groq.RateLimitError,
+    groq.InternalServerError,
+    groq.APIConnectionError,  # includes APITimeoutError
+    httpx.TransportError,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+@functools.lru_cache(maxsize=8)
+def _make_chat_groq(model: str, temperature: float, api_key: str) -> ChatGroq:
+    """Return a ChatGroq client shared by every GroqTool with the same settings (one HTTP pool)."""
+    return ChatGroq(
+        model=model,
+        groq_api_key=api_key,
+        temperature=temperature,
+    )
+
+
+def _log_retry(retry_state: RetryCallState) -> None:
+    """Log a failed Groq attempt before tenacity sleeps and retries."""
+    logger.warning(
+        f"Groq LLM call attempt {retry_state.attempt_number} failed: "
+        f"{retry_state.outcome.exception()}"
+    )
+
+
+class BriefingItem(BaseModel):
+    """One article blurb in a generated briefing."""
+    index: int = Field(description="Index of the article in the input list")
+    blurb: str = Field(description="1-2 sentence, reader-friendly summary")
+
+
+class Briefing(BaseModel):
+    """Structured email content returned by the LLM (rendered to HTML in Python)."""
+    greeting: str = Field(description="Short personalized greeting")
+    items: List[BriefingItem] = Field(default_factory=list)
+    closing: str = Field(description="Short sign-off")
+
+
+# Compiled once; autoescape keeps titles/summaries from injecting markup
+_EMAIL_TEMPLATE = jinja2.Environment(autoescape=True).from_string(
+    "<html><body>"
+    "<h2>Your Daily Briefing</h2>"
+    "{% if greeting %}<p>{{ greeting }}</p>{% endif %}"
+    "<ul>"
+    "{% for item in items %}"
+    '<li><strong>{{ item.title }}</strong><br>{{ item.blurb }}<br>'
+    '<a href="{{ item.url }}">Read more</a></li>'
+    "{% endfor %}"
+    "</ul>"
+    "{% if closing %}<p>{{ closing }}</p>{% endif %}"
+    "</body></html>"
+)
+
 
 class GroqTool:
     """Tool for LLM operations using Groq API."""
     
+    BATCH_SUMMARY_PROMPT = """You are a news summarizer. Generate concise, engaging 
+        1-2 line summaries of news articles in TLDR style. Focus on key facts and 
+        why it matters. Be unique - avoid repetition. Return only a JSON object of the 
+        form {"summaries": [{"index": <article index>, "summary": <summary>}, ...]}."""
+    
+    # Groq JSON mode: the response is guaranteed to be a parseable JSON object
+    JSON_RESPONSE_FORMAT = {"response_format": {"type": "json_object"}}
+    
+    # Output budget per article in a batched summary prompt (summary plus JSON framing)
+    SUMMARY_TOKENS_PER_ARTICLE = 80
+    
     def __init__(self):
         """Initialize Groq LLM client."""
         if not config.GROQ_API_KEY:
             raise ValueError("GROQ_API_KEY not configured")
-        self.llm = ChatGroq(
-            model=config.GROQ_MODEL,
-            groq_api_key=config.GROQ_API_KEY,
-            temperature=0.7,
-        )
+        self.llm = _make_chat_groq(config.GROQ_MODEL, 0.7, config.GROQ_API_KEY)
+        self.briefing_llm = self.llm.with_structured_output(Briefing)
         self.max_retries = 3
         self.base_delay = 1
     
-    def _call_llm_with_retry(self, messages: List, system_prompt: str = None) -> str:
-        """Call LLM with retry logic."""
+    def _build_messages(self, messages: List, system_prompt: str = None) -> List:
+        """Prepend the optional system prompt to a list of messages."""
         all_messages = []
         if system_prompt:
             all_messages.append(SystemMessage(content=system_prompt))
         all_messages.extend(messages)
+        return all_messages
+    
+    def _call_llm_with_retry(self, messages: List, system_prompt: str = None, **kwargs) -> str:
+        """Call LLM with retry logic (kwargs are passed through to the Groq API)."""
+        response = self._invoke_with_retry(self.llm, messages, system_prompt, **kwargs)
+        return response.content
+    
+    def _retry_policy(self) -> Dict[str, Any]:
+        """Tenacity settings shared by sync and async LLM calls (jittered exponential backoff)."""
+        return {
+            "wait": wait_random_exponential(multiplier=self.base_delay, min=self.base_delay, max=16),
+            "stop": stop_after_attempt(self.max_retries),
+            "retry": retry_if_exception_type(_RETRYABLE_ERRORS),
+            "before_sleep": _log_retry,
+            "reraise": True,
+        }
+    
+    def _invoke_with_retry(self, llm: Any, messages: List, system_prompt: str = None, **kwargs) -> Any:
+        """Invoke a runnable (plain or structured-output LLM) with retry logic."""
+        all_messages = self._build_messages(messages, system_prompt)
         
-        for attempt in range(self.max_retries):
-            try:
-                response = self.llm.invoke(all_messages)
-                return response.content
-            except Exception as e:
-                logger.warning(f"Groq LLM call attempt {attempt + 1} failed: {str(e)}")
-                if attempt < self.max_retries - 1:
-                    delay = self.base_delay * (2 ** attempt)
-                    time.sleep(delay)
-                else:
-                    logger.error(f"Groq LLM call failed after {self.max_retries} attempts")
-                    raise
-        
-        return ""
+        try:
+            for attempt in Retrying(**self._retry_policy()):
+                with attempt:
+                    return llm.invoke(all_messages, **kwargs)
+        except Exception as e:
+            logger.error(f"Groq LLM call failed: {str(e)}")
+            raise
+    
+    async def _acall_llm_with_retry(self, messages: List, system_prompt: str = None, **kwargs) -> str:
+        """Call LLM asynchronously with retry logic (backoff does not block the event loop)."""
+        all_messages = self._build_messages(messages, system_prompt)
+        
+        try:
+            async for attempt in AsyncRetrying(**self._retry_policy()):
+                with attempt:
+                    response = await self.llm.ainvoke(all_messages, **kwargs)
+                    return response.content
+        except Exception as e:
+            logger.error(f"Groq LLM call failed: {str(e)}")
+            raise
     
     def analyze_preferences(self, preferences: Dict[str, Any]) -> List[str]:
         """
@@ -52,7 +158,26 @@ class GroqTool:
         
         Args:
             preferences: User preferences dict with topics, timezone, etc.
-            
+        
+        Returns:
+            List of search query strings
+        """
+        try:
+            return self.generate_search_queries(preferences)
+        except Exception as e:
+            logger.error(f"Failed to analyze preferences: {str(e)}")
+            return self.fallback_queries(preferences)
+    
+    def generate_search_queries(self, preferences: Dict[str, Any]) -> List[str]:
+        """
+        Generate search queries with the LLM, raising on failure.
+        
+        Unlike analyze_preferences, errors (after retries) are not replaced with
+        fallback_queries, so callers can tell LLM output from the fallback.
+        
+        Args:
+            preferences: User preferences dict with topics, timezone, etc.
+        
         Returns:
             List of search query strings
         """
@@ -67,24 +192,31 @@ class GroqTool:
         topics_str = ", ".join(topics)
         user_message = f"User topics: {topics_str}\n\nGenerate search queries:"
         
-        try:
-            response = self._call_llm_with_retry(
-                [HumanMessage(content=user_message)],
-                system_prompt
-            )
-            
-            # Parse response into list of queries
-            queries = [q.strip() for q in response.split("\n") if q.strip()]
-            # Limit to 2 queries max
-            queries = queries[:2]
-            
-            logger.info(f"Generated {len(queries)} search queries from preferences")
-            return queries
-            
-        except Exception as e:
-            logger.error(f"Failed to analyze preferences: {str(e)}")
-            # Fallback: create simple queries from topics
-            return [f"{topic} news" for topic in topics[:2]]
+        response = self._call_llm_with_retry(
+            [HumanMessage(content=user_message)],
+            system_prompt
+        )
+        
+        # Parse response into list of queries
+        queries = [q.strip() for q in response.split("\n") if q.strip()]
+        # Limit to 2 queries max
+        queries = queries[:2]
+        
+        logger.info(f"Generated {len(queries)} search queries from preferences")
+        return queries
+    
+    @staticmethod
+    def fallback_queries(preferences: Dict[str, Any]) -> List[str]:
+        """
+        Build simple search queries straight from the user's topics.
+        
+        Args:
+            preferences: User preferences dict with topics
+        
+        Returns:
+            List of search query strings
+        """
+        return [f"{topic} news" for topic in preferences.get("topics", [])[:2]]
     
     def summarize_article(
         self, 
@@ -97,7 +229,7 @@ class GroqTool:
         Args:
             article: Article dict with title, content, url
             user_context: Optional user context for personalization
-            
+        
         Returns:
             Summary string (1-2 lines)
         """
@@ -121,12 +253,196 @@ class GroqTool:
             
             logger.info(f"Generated summary for article: {title[:50]}...")
             return summary
-            
+        
         except Exception as e:
             logger.error(f"Failed to summarize article: {str(e)}")
             # Fallback: use title as summary
             return title
     
+    def summarize_articles_batch(
+        self,
+        articles: List[Dict[str, Any]],
+        user_context: Dict[str, Any] = None,
+        batch_size: int = 8,
+        max_concurrency: int = 8
+    ) -> List[str]:
+        """
+        Generate 1-2 line summaries for many articles with one LLM call per batch.
+        
+        Each batch is retried on its own, so one rate-limited request does not
+        cost the whole run its summaries.
+        
+        Args:
+            articles: List of article dicts with title, content, url
+            user_context: Optional user context for personalization
+            batch_size: Maximum number of articles packed into a single prompt
+            max_concurrency: Maximum number of in-flight Groq requests
+        
+        Returns:
+            List of summary strings, in the same order as articles
+        """
+        if not articles:
+            return []
+        
+        batches, prompts = self._prepare_summary_batches(articles, batch_size)
+        
+        try:
+            if len(prompts) == 1:
+                responses = [self._call_llm_with_retry(
+                    prompts[0], self.BATCH_SUMMARY_PROMPT, **self._summary_kwargs(len(batches[0]))
+                )]
+            else:
+                # Send the batches as concurrent requests, each with the usual retry policy
+                with ThreadPoolExecutor(max_workers=min(len(prompts), max_concurrency)) as executor:
+                    futures = [
+                        executor.submit(
+                            self._call_llm_with_retry,
+                            prompt, self.BATCH_SUMMARY_PROMPT, **self._summary_kwargs(len(batch))
+                        )
+                        for prompt, batch in zip(prompts, batches)
+                    ]
+                responses = [
+                    self._batch_result_content(future.exception() or future.result())
+                    for future in futures
+                ]
+        except Exception as e:
+            logger.error(f"Failed to summarize article batch: {str(e)}")
+            # Fallback: every article uses its title as summary
+            responses = [""] * len(batches)
+        
+        return self._collect_batch_summaries(batches, responses)
+    
+    async def asummarize_articles(
+        self,
+        articles: List[Dict[str, Any]],
+        user_context: Dict[str, Any] = None,
+        batch_size: int = 8,
+        max_concurrency: int = 8
+    ) -> List[str]:
+        """
+        Async variant of summarize_articles_batch that fires all batches concurrently.
+        
+        Each batch is retried on its own, so one rate-limited request does not
+        cost the whole run its summaries.
+        
+        Args:
+            articles: List of article dicts with title, content, url
+            user_context: Optional user context for personalization
+            batch_size: Maximum number of articles packed into a single prompt
+            max_concurrency: Maximum number of in-flight Groq requests
+        
+        Returns:
+            List of summary strings, in the same order as articles
+        """
+        if not articles:
+            return []
+        
+        batches, prompts = self._prepare_summary_batches(articles, batch_size)
+        semaphore = asyncio.Semaphore(max_concurrency)  # Stay under Groq's rate limits
+        
+        async def summarize_batch(prompt: List, size: int) -> str:
+            async with semaphore:
+                return await self._acall_llm_with_retry(
+                    prompt, self.BATCH_SUMMARY_PROMPT, **self._summary_kwargs(size)
+                )
+        
+        results = await asyncio.gather(
+            *(summarize_batch(prompt, len(batch)) for prompt, batch in zip(prompts, batches)),
+            return_exceptions=True
+        )
+        responses = [self._batch_result_content(result) for result in results]
+        
+        return self._collect_batch_summaries(batches, responses)
+    
+    def _prepare_summary_batches(
+        self,
+        articles: List[Dict[str, Any]],
+        batch_size: int
+    ) -> Tuple[List[List[Dict[str, Any]]], List[List]]:
+        """Split articles into batches and build one prompt per batch."""
+        batches = [articles[i:i + batch_size] for i in range(0, len(articles), batch_size)]
+        prompts = []
+        for batch in batches:
+            article_lines = []
+            for i, article in enumerate(batch):
+                title = article.get("title", "")
+                content = article.get("content", "")[:500]  # Limit content length
+                article_lines.append(f"[{i}] Title: {title}\n    Content: {content}")
+            user_message = "\n\n".join(article_lines) + "\n\nGenerate the JSON summaries:"
+            prompts.append([HumanMessage(content=user_message)])
+        return batches, prompts
+    
+    def _summary_kwargs(self, batch_size: int) -> Dict[str, Any]:
+        """Groq request options for a summary batch: JSON mode and a bounded output length."""
+        return {**self.JSON_RESPONSE_FORMAT, "max_tokens": self.SUMMARY_TOKENS_PER_ARTICLE * batch_size}
+    
+    def _batch_result_content(self, result: Any) -> str:
+        """Extract content from a batch request's result, mapping failures to an empty response."""
+        if isinstance(result, Exception):
+            logger.warning(f"Groq batch summary request failed: {str(result)}")
+            return ""
+        return result if isinstance(result, str) else result.content
+    
+    def _collect_batch_summaries(
+        self,
+        batches: List[List[Dict[str, Any]]],
+        responses: List[str]
+    ) -> List[str]:
+        """Parse every batch response into a flat list of summaries."""
+        summaries = []
+        for batch, response in zip(batches, responses):
+            summaries.extend(self._parse_batch_summaries(response, batch))
+        
+        logger.info(f"Generated {len(summaries)} summaries in {len(batches)} batched LLM calls")
+        return summaries
+    
+    @staticmethod
+    def _load_summary_items(response: str) -> Optional[List[Any]]:
+        """Decode the summary items of a batched response, or None if it isn't JSON."""
+        try:
+            # JSON mode returns {"summaries": [...]}
+            parsed = orjson.loads(response)
+        except ValueError:
+            # Tolerate a bare array with prose or code fences around it
+            try:
+                parsed = orjson.loads(response[response.find("["):response.rfind("]") + 1])
+            except ValueError:
+                return None
+        
+        if isinstance(parsed, dict):
+            parsed = parsed.get("summaries")
+        return parsed if isinstance(parsed, list) else []
+    
+    def _parse_batch_summaries(
+        self,
+        response: str,
+        batch: List[Dict[str, Any]]
+    ) -> List[str]:
+        """Parse a batched summary response, falling back to titles for gaps."""
+        summaries = [""] * len(batch)
+        items = self._load_summary_items(response)
+        
+        if items is None:
+            # Not JSON: treat each non-empty line as the next summary
+            lines = [line.strip() for line in response.split("\n") if line.strip()][:len(batch)]
+            summaries[:len(lines)] = lines
+        else:
+            for item in items:
+                # A malformed item only loses its own summary, not the whole batch
+                try:
+                    index = int(item["index"])
+                    summary = item["summary"]
+                except (ValueError, TypeError, KeyError):
+                    logger.warning(f"Skipping malformed summary item: {str(item)[:100]}")
+                    continue
+                if 0 <= index < len(batch) and isinstance(summary, str):
+                    summaries[index] = summary
+        
+        return [
+            summary.strip().strip('"').strip("'") or article.get("title", "")
+            for summary, article in zip(summaries, batch)
+        ]
+    
     def generate_email_content(
         self, 
         summaries: List[Dict[str, Any]], 
@@ -138,51 +454,49 @@ class GroqTool:
         Args:
             summaries: List of dicts with article info and summaries
             user_preferences: User preferences for personalization
-            
+        
         Returns:
             HTML email content string
         """
         if not summaries:
             return "<p>No new articles found today.</p>"
         
-        system_prompt = """You are an email content generator. Create a clean, 
-        professional HTML email with article summaries. Use simple HTML tags like 
-        <h2>, <p>, <a>, <ul>, <li>. Make it readable and engaging."""
+        system_prompt = """You are an email content writer for a personal news 
+        briefing. Write a short greeting, a 1-2 sentence blurb for each article 
+        (referenced by its index), and a short closing. Do not write HTML."""
         
         summaries_text = ""
-        for i, item in enumerate(summaries, 1):
+        for i, item in enumerate(summaries):
             title = item.get("title", "")
             summary = item.get("summary", "")
-            url = item.get("url", "")
-            summaries_text += f"{i}. {title}\n   {summary}\n   URL: {url}\n\n"
-        
-        user_message = f"""Create an HTML email with these article summaries:
+            summaries_text += f"[{i}] {title}\n    {summary}\n"
         
-{summaries_text}
+        topics = ", ".join(user_preferences.get("topics", []))
+        user_message = f"""Write the briefing for a reader interested in: {topics or "general news"}
 
-Include a greeting and closing. Format as clean HTML."""
-        
+{summaries_text}"""
+
+        greeting, closing = "", ""
+        blurbs: Dict[int, str] = {}
         try:
-            html_content = self._call_llm_with_retry(
+            briefing = Briefing.model_validate(self._invoke_with_retry(
+                self.briefing_llm,
                 [HumanMessage(content=user_message)],
                 system_prompt
-            )
-            
-            # Ensure it's valid HTML
-            if not html_content.strip().startswith("<"):
-                html_content = f"<html><body>{html_content}</body></html>"
-            
+            ))
+            greeting, closing = briefing.greeting, briefing.closing
+            blurbs = {item.index: item.blurb for item in briefing.items}
             logger.info(f"Generated email content with {len(summaries)} articles")
-            return html_content
-            
         except Exception as e:
             logger.error(f"Failed to generate email content: {str(e)}")
-            # Fallback: simple HTML
-            html = "<html><body><h2>Your Daily Briefing</h2><ul>"
-            for item in summaries:
-                title = item.get("title", "")
-                summary = item.get("summary", "")
-                url = item.get("url", "")
-                html += f'<li><strong>{title}</strong><br>{summary}<br><a href="{url}">Read more</a></li>'
-            html += "</ul></body></html>"
-            return html
+            # Fallback: render the article summaries without LLM copy
+        
+        items = [
+            {
+                "title": item.get("title", ""),
+                "blurb": blurbs.get(i) or item.get("summary", ""),
+                "url": item.get("url", ""),
+            }
+            for i, item in enumerate(summaries)
+        ]
+        return _EMAIL_TEMPLATE.render(greeting=greeting, items=items, closing=closing)
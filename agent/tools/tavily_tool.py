@@ -1,12 +1,43 @@
 """Tavily search tool for news article retrieval."""
-import time
+import asyncio
 import logging
+import weakref
 from typing import List, Dict, Any
-from tavily import TavilyClient
+from tavily import (
+    BadRequestError,
+    InvalidAPIKeyError,
+    MissingAPIKeyError,
+    TavilyClient,
+    UsageLimitExceededError,
+)
+from tenacity import (
+    AsyncRetrying,
+    RetryCallState,
+    Retrying,
+    retry_if_not_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
 from config import config
 
 logger = logging.getLogger(__name__)
 
+# Bad key, bad request or exhausted quota: retrying cannot succeed
+_NON_RETRYABLE_ERRORS = (
+    BadRequestError,
+    InvalidAPIKeyError,
+    MissingAPIKeyError,
+    UsageLimitExceededError,
+)
+
+
+def _log_retry(retry_state: RetryCallState) -> None:
+    """Log a failed Tavily attempt before tenacity sleeps and retries."""
+    logger.warning(
+        f"Tavily search attempt {retry_state.attempt_number} failed: "
+        f"{retry_state.outcome.exception()}"
+    )
+
 
 class TavilyTool:
     """Tool for searching news articles using Tavily API."""
@@ -16,6 +47,11 @@ class TavilyTool:
         if not config.TAVILY_API_KEY:
             raise ValueError("TAVILY_API_KEY not configured")
         self.client = TavilyClient(api_key=config.TAVILY_API_KEY)
+        # Per event loop bound on in-flight async searches, keeping them within the
+        # client's pooled connections (asyncio semaphores are bound to one loop)
+        self._search_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
         self.max_retries = 3
         self.base_delay = 1
     
@@ -30,42 +66,84 @@ class TavilyTool:
         Args:
             query: Search query string
             max_results: Maximum number of results to return
-            
+        
+        Returns:
+            List of article dictionaries with title, url, content, published_date, score
+        """
+        try:
+            for attempt in Retrying(**self._retry_policy()):
+                with attempt:
+                    return self._search_once(query, max_results)
+        except Exception as e:
+            logger.error(f"Tavily search failed for query '{query}': {str(e)}")
+            raise
+    
+    async def asearch_news(
+        self,
+        query: str,
+        max_results: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        Async variant of search_news (the blocking client call runs in a worker thread).
+        
+        Args:
+            query: Search query string
+            max_results: Maximum number of results to return
+        
         Returns:
             List of article dictionaries with title, url, content, published_date, score
         """
-        for attempt in range(self.max_retries):
-            try:
-                response = self.client.search(
-                    query=query,
-                    max_results=max_results,
-                    search_depth="advanced",
-                    include_answer=False,
-                    include_raw_content=True
-                )
-                
-                articles = []
-                for result in response.get("results", []):
-                    article = {
-                        "title": result.get("title", ""),
-                        "url": result.get("url", ""),
-                        "content": result.get("content", ""),
-                        "published_date": result.get("published_date"),
-                        "score": result.get("score", 0.0),
-                        "raw_content": result.get("raw_content", ""),
-                    }
-                    articles.append(article)
-                
-                logger.info(f"Tavily search successful: {len(articles)} articles for query '{query}'")
-                return articles
-                
-            except Exception as e:
-                logger.warning(f"Tavily search attempt {attempt + 1} failed: {str(e)}")
-                if attempt < self.max_retries - 1:
-                    delay = self.base_delay * (2 ** attempt)  # Exponential backoff
-                    time.sleep(delay)
-                else:
-                    logger.error(f"Tavily search failed after {self.max_retries} attempts")
-                    raise
+        try:
+            # Backoff sleeps on the event loop, so other in-flight searches keep running
+            async for attempt in AsyncRetrying(**self._retry_policy()):
+                with attempt:
+                    # Wait for a slot on the loop, not in a worker thread: queued searches
+                    # must not tie up the executor that database lookups also run on
+                    async with self._loop_search_slots():
+                        return await asyncio.to_thread(self._search_once, query, max_results)
+        except Exception as e:
+            logger.error(f"Tavily search failed for query '{query}': {str(e)}")
+            raise
+    
+    def _loop_search_slots(self) -> asyncio.Semaphore:
+        """Return the running event loop's search semaphore, creating it on first use."""
+        loop = asyncio.get_running_loop()
+        slots = self._search_slots.get(loop)
+        if slots is None:
+            slots = self._search_slots[loop] = asyncio.Semaphore(config.MAX_CONCURRENT_SEARCHES)
+        return slots
+    
+    def _search_once(self, query: str, max_results: int) -> List[Dict[str, Any]]:
+        """Run a single Tavily search request and normalize the results."""
+        response = self.client.search(
+            query=query,
+            max_results=max_results,
+            search_depth="advanced",
+            include_answer=False,
+            include_raw_content=False
+        )
         
-        return []
+        articles = [
+            {
+                "title": result.get("title", ""),
+                "url": result.get("url", ""),
+                "content": result.get("content", ""),
+                "published_date": result.get("published_date"),
+                "score": result.get("score", 0.0),
+            }
+            for result in response.get("results", [])[:max_results]
+        ]
+        
+        logger.info(f"Tavily search successful: {len(articles)} articles for query '{query}'")
+        return articles
+    
+    def _retry_policy(self) -> Dict[str, Any]:
+        """Tenacity settings shared by sync and async searches (exponential backoff, full jitter)."""
+        return {
+            "wait": wait_random_exponential(multiplier=self.base_delay, max=30),
+            "stop": stop_after_attempt(self.max_retries),
+            # Bad key, bad request or exhausted quota: fail fast
+            "retry": retry_if_not_exception_type(_NON_RETRYABLE_ERRORS),
+            "before_sleep": _log_retry,
+            "reraise": True,
+        }
@@ -1,7 +1,15 @@
 """LangGraph workflow definition for the AI briefing agent."""
+import asyncio
 import logging
-from typing import Literal
+from functools import cached_property
+from typing import Any, Dict, List, Literal, Set, Tuple
+import orjson
+import xxhash
+from langgraph.cache.base import BaseCache
+from langgraph.cache.memory import InMemoryCache
+from langgraph.cache.sqlite import SqliteCache
 from langgraph.graph import StateGraph, END
+from agent.near_duplicates import NearDuplicateFilter
 from agent.state import AgentState
 from agent.tools import (
     TavilyTool,
@@ -10,35 +18,71 @@ from agent.tools import (
     EmailTool,
     CalendarTool,
 )
+from config import config
 
 logger = logging.getLogger(__name__)
 
+# Cache namespaces for per-article summaries and per-topic-list search queries
+_SUMMARY_CACHE_NS = ("summaries",)
+_QUERY_CACHE_NS = ("queries",)
+
 
 class BriefingAgentWorkflow:
     """LangGraph workflow for AI briefing agent."""
     
     def __init__(self):
-        """Initialize workflow with tools."""
-        self.tavily = TavilyTool()
-        self.groq = GroqTool()
-        self.database = DatabaseTool()
-        self.email = EmailTool()
+        """Initialize workflow (tools are created lazily, on first use)."""
         self.calendar = CalendarTool()
         
+        # Summaries are shared across users, so an article is summarized once per TTL;
+        # search queries for an unchanged topic list are reused the same way
+        self.summary_cache = self._create_summary_cache()
+        
         # Build workflow graph
         self.graph = self._build_workflow()
         self.app = self.graph.compile()
     
+    # API clients are only built once a run gets past the calendar check, so
+    # skipped (off-schedule) invocations don't pay for them
+    @cached_property
+    def tavily(self) -> TavilyTool:
+        return TavilyTool()
+    
+    @cached_property
+    def groq(self) -> GroqTool:
+        return GroqTool()
+    
+    @cached_property
+    def database(self) -> DatabaseTool:
+        return DatabaseTool()
+    
+    @cached_property
+    def email(self) -> EmailTool:
+        return EmailTool()
+    
+    def _create_summary_cache(self) -> BaseCache:
+        """Create the summary cache (SQLite-backed when SUMMARY_CACHE_PATH is set)."""
+        if config.SUMMARY_CACHE_PATH:
+            logger.info(f"Using SQLite summary cache: {config.SUMMARY_CACHE_PATH}")
+            return SqliteCache(path=config.SUMMARY_CACHE_PATH)
+        return InMemoryCache()
+    
+    def _summary_cache_key(self, article: Dict[str, Any]) -> str:
+        """Cache key for an article summary."""
+        return xxhash.xxh3_64_hexdigest(f"{article.get('url', '')}\x1f{article.get('title', '')}".encode())
+    
+    def _query_cache_key(self, preferences: Dict[str, Any]) -> str:
+        """Cache key for the search queries generated from a user's topics (order and repeats ignored)."""
+        return xxhash.xxh3_64_hexdigest(orjson.dumps(sorted(set(preferences.get("topics", [])))))
+    
     def _build_workflow(self) -> StateGraph:
-        """Build the LangGraph workflow with 8 nodes."""
+        """Build the LangGraph workflow (search, dedup and summarize run as one pipelined node)."""
         workflow = StateGraph(AgentState)
         
         # Add nodes
         workflow.add_node("calendar_check", self.calendar_check_node)
         workflow.add_node("query_analysis", self.query_analysis_node)
-        workflow.add_node("search", self.search_node)
-        workflow.add_node("deduplication", self.deduplication_node)
-        workflow.add_node("summarize", self.summarize_node)
+        workflow.add_node("fetch", self.fetch_dedup_summarize_node)
         workflow.add_node("store", self.store_node)
         workflow.add_node("format", self.format_node)
         workflow.add_node("email", self.email_node)
@@ -55,21 +99,10 @@ class BriefingAgentWorkflow:
             }
         )
         
-        workflow.add_edge("query_analysis", "search")
-        
-        workflow.add_conditional_edges(
-            "search",
-            self.should_continue_after_search,
-            {
-                "continue": "deduplication",
-                "skip": END,
-            }
-        )
-        
-        workflow.add_edge("deduplication", "summarize")
+        workflow.add_edge("query_analysis", "fetch")
         
         workflow.add_conditional_edges(
-            "summarize",
+            "fetch",
             self.should_continue_after_summarize,
             {
                 "continue": "store",
@@ -87,29 +120,23 @@ class BriefingAgentWorkflow:
         """Node 1: Validate if it's time to send."""
         logger.info("Node 1: Calendar Check")
         
-        # Initialize state fields if missing
-        if "errors" not in state:
-            state["errors"] = []
-        if "metadata" not in state:
-            state["metadata"] = {}
-        
         try:
-            preferences = state.get("user_preferences", {})
+            preferences = state.user_preferences
             timezone = preferences.get("timezone", "UTC")
             schedule_time = preferences.get("schedule_time", "09:00")
             
             is_valid = self.calendar.validate_send_time(timezone, schedule_time)
             
             if not is_valid:
-                state["errors"].append("Not scheduled time yet")
+                state.errors.append("Not scheduled time yet")
                 logger.info("Calendar check: Not scheduled time, skipping")
             
-            state["metadata"]["calendar_check_passed"] = is_valid
-            
+            state.metadata["calendar_check_passed"] = is_valid
+        
         except Exception as e:
             logger.error(f"Calendar check failed: {str(e)}")
-            state["errors"].append(f"Calendar check error: {str(e)}")
-            state["metadata"]["calendar_check_passed"] = False
+            state.errors.append(f"Calendar check error: {str(e)}")
+            state.metadata["calendar_check_passed"] = False
         
         return state
     
@@ -117,127 +144,174 @@ class BriefingAgentWorkflow:
         """Node 2: Generate search queries from preferences."""
         logger.info("Node 2: Query Analysis")
         
-        # Initialize state fields if missing
-        if "errors" not in state:
-            state["errors"] = []
-        if "metadata" not in state:
-            state["metadata"] = {}
+        preferences = state.user_preferences
         
         try:
-            preferences = state.get("user_preferences", {})
-            queries = self.groq.analyze_preferences(preferences)
+            key = (_QUERY_CACHE_NS, self._query_cache_key(preferences))
+            cached = self.summary_cache.get([key])
             
-            state["search_queries"] = queries
-            state["metadata"]["queries_generated"] = len(queries)
+            if key in cached:
+                queries = cached[key]
+                state.metadata["queries_cached"] = True
+            else:
+                # Raises on LLM failure, so only real LLM output is cached
+                queries = self.groq.generate_search_queries(preferences)
+                if queries:
+                    self.summary_cache.set({key: (queries, config.SUMMARY_CACHE_TTL)})
             
-            logger.info(f"Generated {len(queries)} search queries")
+            state.search_queries = queries
+            state.metadata["queries_generated"] = len(queries)
             
+            logger.info(f"Generated {len(queries)} search queries")
+        
         except Exception as e:
             logger.error(f"Query analysis failed: {str(e)}")
-            state["errors"].append(f"Query analysis error: {str(e)}")
-            # Fallback: use topics directly
-            topics = preferences.get("topics", [])
-            state["search_queries"] = [f"{topic} news" for topic in topics[:2]]
-        
-        return state
-    
-    def search_node(self, state: AgentState) -> AgentState:
-        """Node 3: Execute Tavily searches."""
-        logger.info("Node 3: Search")
-        
-        # Initialize state fields if missing
-        if "errors" not in state:
-            state["errors"] = []
-        if "metadata" not in state:
-            state["metadata"] = {}
-        
-        articles = []
-        queries = state.get("search_queries", [])
-        
-        for query in queries:
-            try:
-                results = self.tavily.search_news(query, max_results=5)
-                articles.extend(results)
-                logger.info(f"Search query '{query}': {len(results)} articles")
-            except Exception as e:
-                logger.error(f"Search failed for query '{query}': {str(e)}")
-                state["errors"].append(f"Search error for '{query}': {str(e)}")
-        
-        state["articles"] = articles
-        state["metadata"]["articles_found"] = len(articles)
+            state.errors.append(f"Query analysis error: {str(e)}")
+            # Fallback: use topics directly (never cached)
+            state.search_queries = GroqTool.fallback_queries(preferences)
         
         return state
     
-    def deduplication_node(self, state: AgentState) -> AgentState:
-        """Node 4: Filter duplicates."""
-        logger.info("Node 4: Deduplication")
-        
-        articles = state.get("articles", [])
-        user_email = state.get("user_email", "")
+    def _filter_new_articles(
+        self,
+        articles: List[Dict[str, Any]],
+        user_email: str,
+        seen: Set[int],
+        near_duplicates: NearDuplicateFilter
+    ) -> List[Dict[str, Any]]:
+        """Drop already-sent, repeated and near-duplicate articles (seen/near_duplicates are per run).
+        
+        Delivery depends only on the user's own history: an article stored for an
+        earlier user still reaches this one. The global article store only decides
+        what store_node writes.
+        """
         deduplicated = []
         
-        for article in articles:
-            # Generate article hash
-            article_hash = self.database.get_article_hash(article)
-            article_id = article.get("url", article_hash)
-            
-            # Check article-level deduplication
-            if self.database.check_article_hash(article_hash):
+        # Hash and check user-level deduplication for the whole batch up front
+        hashes = self.database.get_article_hashes(articles)
+        article_ids = [article.get("url", str(h)) for article, h in zip(articles, hashes)]
+        already_sent = self.database.check_user_history_batch(user_email, article_ids)
+        
+        for article, article_hash, article_id, was_sent in zip(
+            articles, hashes, article_ids, already_sent
+        ):
+            # Same article returned by more than one query this run
+            if article_hash in seen:
                 logger.debug(f"Article duplicate (hash): {article.get('title', '')[:50]}")
                 continue
             
             # Check user-level deduplication
-            if self.database.check_user_history(user_email, article_id):
+            if was_sent:
                 logger.debug(f"Article already sent to user: {article.get('title', '')[:50]}")
                 continue
             
             # Add article ID for tracking
             article["article_id"] = article_id
             article["article_hash"] = article_hash
+            seen.add(article_hash)
             deduplicated.append(article)
         
-        state["deduplicated_articles"] = deduplicated
-        state["metadata"]["duplicates_filtered"] = len(articles) - len(deduplicated)
-        state["metadata"]["articles_after_dedup"] = len(deduplicated)
-        
-        logger.info(f"Deduplication: {len(articles)} -> {len(deduplicated)} articles")
-        
-        return state
+        # Same story under a different URL (syndicated copies, mirrors)
+        return near_duplicates.filter(deduplicated)
+    
+    async def _asummarize(
+        self,
+        articles: List[Dict[str, Any]],
+        preferences: Dict[str, Any]
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Summarize articles through the summary cache, returning (summaries, cache hits)."""
+        keys = [(_SUMMARY_CACHE_NS, self._summary_cache_key(article)) for article in articles]
+        cached = await self.summary_cache.aget(keys)
+        misses = [(key, article) for key, article in zip(keys, articles) if key not in cached]
+        
+        if misses:
+            # Fire all summary batches concurrently on the async Groq client
+            summary_texts = await self.groq.asummarize_articles(
+                [article for _, article in misses], preferences
+            )
+            cached.update({key: text for (key, _), text in zip(misses, summary_texts)})
+            # Don't cache title fallbacks from failed LLM calls
+            await self.summary_cache.aset({
+                key: (text, config.SUMMARY_CACHE_TTL)
+                for (key, article), text in zip(misses, summary_texts)
+                if text != article.get("title", "")
+            })
+        
+        summaries = [
+            {
+                "title": article.get("title", ""),
+                "url": article.get("url", ""),
+                "summary": cached[key],
+                "article_id": article.get("article_id"),
+                "article_hash": article.get("article_hash"),
+            }
+            for key, article in zip(keys, articles)
+        ]
+        return summaries, len(articles) - len(misses)
     
-    def summarize_node(self, state: AgentState) -> AgentState:
-        """Node 5: Generate summaries."""
-        logger.info("Node 5: Summarize")
-        
-        # Initialize state fields if missing
-        if "errors" not in state:
-            state["errors"] = []
-        if "metadata" not in state:
-            state["metadata"] = {}
-        
-        articles = state.get("deduplicated_articles", [])
-        preferences = state.get("user_preferences", {})
-        summaries = []
-        
-        for article in articles:
-            try:
-                summary_text = self.groq.summarize_article(article, preferences)
-                summaries.append({
-                    "title": article.get("title", ""),
-                    "url": article.get("url", ""),
-                    "summary": summary_text,
-                    "article_id": article.get("article_id"),
-                    "article_hash": article.get("article_hash"),
-                })
-            except Exception as e:
-                logger.error(f"Summarization failed for article: {str(e)}")
-                state["errors"].append(f"Summarization error: {str(e)}")
-                # Skip this article
+    async def fetch_dedup_summarize_node(self, state: AgentState) -> AgentState:
+        """Nodes 3-5 pipelined: each query's results are deduplicated and summarized as they arrive."""
+        # Async node: it runs on the ainvoke event loop, so concurrent users share one
+        # loop (and the async Groq client's connection pool) instead of one loop each
+        logger.info("Node 3-5: Search -> Deduplication -> Summarize")
+        
+        queries = state.search_queries
+        user_email = state.user_email
+        preferences = state.user_preferences
+        
+        articles, deduplicated, summaries = [], [], []
+        seen: Set[int] = set()
+        near_duplicates = NearDuplicateFilter(config.NEAR_DUPLICATE_THRESHOLD)
+        summary_tasks = []
+        cached = 0
+        
+        searches = {
+            asyncio.create_task(self.tavily.asearch_news(query, max_results=5)): query
+            for query in queries
+        }
+        pending = set(searches)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                query = searches[task]
+                try:
+                    results = task.result()
+                except Exception as e:
+                    logger.error(f"Search failed for query '{query}': {str(e)}")
+                    state.errors.append(f"Search error for '{query}': {str(e)}")
+                    continue
+                
+                logger.info(f"Search query '{query}': {len(results)} articles")
+                articles.extend(results)
+                # Database lookups block, so keep them off the loop other users run on
+                new_articles = await asyncio.to_thread(
+                    self._filter_new_articles, results, user_email, seen, near_duplicates
+                )
+                deduplicated.extend(new_articles)
+                if new_articles:
+                    # Start summarizing now; remaining searches keep running meanwhile
+                    summary_tasks.append(asyncio.create_task(self._asummarize(new_articles, preferences)))
+        
+        for result in await asyncio.gather(*summary_tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.error(f"Summarization failed: {str(result)}")
+                state.errors.append(f"Summarization error: {str(result)}")
                 continue
-        
-        state["summaries"] = summaries
-        state["metadata"]["summaries_generated"] = len(summaries)
-        
-        logger.info(f"Generated {len(summaries)} summaries")
+            summaries.extend(result[0])
+            cached += result[1]
+        
+        state.articles = articles
+        state.deduplicated_articles = deduplicated
+        state.summaries = summaries
+        state.metadata["articles_found"] = len(articles)
+        state.metadata["duplicates_filtered"] = len(articles) - len(deduplicated)
+        state.metadata["articles_after_dedup"] = len(deduplicated)
+        state.metadata["summaries_cached"] = cached
+        state.metadata["summaries_generated"] = len(summaries)
+        
+        logger.info(
+            f"Pipeline: {len(articles)} found -> {len(deduplicated)} new -> {len(summaries)} summaries"
+        )
         
         return state
     
@@ -245,29 +319,27 @@ class BriefingAgentWorkflow:
         """Node 6: Store articles in database."""
         logger.info("Node 6: Store")
         
-        # Initialize state fields if missing
-        if "errors" not in state:
-            state["errors"] = []
-        if "metadata" not in state:
-            state["metadata"] = {}
-        
-        summaries = state.get("summaries", [])
-        
-        for item in summaries:
-            try:
-                article_hash = item.get("article_hash")
-                if article_hash:
-                    # Reconstruct article dict for storage
-                    article = {
-                        "title": item.get("title"),
-                        "url": item.get("url"),
-                    }
-                    self.database.store_article(article, article_hash)
-            except Exception as e:
-                logger.error(f"Storage failed: {str(e)}")
-                state["errors"].append(f"Storage error: {str(e)}")
-        
-        state["metadata"]["articles_stored"] = len(summaries)
+        summaries = state.summaries
+        
+        stored = 0
+        
+        try:
+            # Only write articles the store hasn't seen (another user may have stored them)
+            hashed = [item for item in summaries if item.get("article_hash")]
+            known = self.database.check_article_hashes([item["article_hash"] for item in hashed])
+            items = [
+                (item["article_hash"], {"title": item.get("title"), "url": item.get("url")})
+                for item, is_stored in zip(hashed, known)
+                if not is_stored
+            ]
+            self.database.store_articles_batch(items)
+            self.database.flush()
+            stored = len(items)
+        except Exception as e:
+            logger.error(f"Storage failed: {str(e)}")
+            state.errors.append(f"Storage error: {str(e)}")
+        
+        state.metadata["articles_stored"] = stored
         
         return state
     
@@ -275,26 +347,20 @@ class BriefingAgentWorkflow:
         """Node 7: Format email content."""
         logger.info("Node 7: Format")
         
-        # Initialize state fields if missing
-        if "errors" not in state:
-            state["errors"] = []
-        if "metadata" not in state:
-            state["metadata"] = {}
-        
         try:
-            summaries = state.get("summaries", [])
-            preferences = state.get("user_preferences", {})
+            summaries = state.summaries
+            preferences = state.user_preferences
             
             html_content = self.groq.generate_email_content(summaries, preferences)
-            state["email_content"] = html_content
+            state.email_content = html_content
             
             logger.info("Email content formatted")
-            
+        
         except Exception as e:
             logger.error(f"Email formatting failed: {str(e)}")
-            state["errors"].append(f"Email formatting error: {str(e)}")
+            state.errors.append(f"Email formatting error: {str(e)}")
             # Fallback: simple HTML
-            state["email_content"] = "<html><body><p>Error generating email content.</p></body></html>"
+            state.email_content = "<html><body><p>Error generating email content.</p></body></html>"
         
         return state
     
@@ -302,15 +368,9 @@ class BriefingAgentWorkflow:
         """Node 8: Send email."""
         logger.info("Node 8: Email")
         
-        # Initialize state fields if missing
-        if "errors" not in state:
-            state["errors"] = []
-        if "metadata" not in state:
-            state["metadata"] = {}
-        
         try:
-            user_email = state.get("user_email", "")
-            email_content = state.get("email_content", "")
+            user_email = state.user_email
+            email_content = state.email_content
             
             if not email_content:
                 logger.warning("No email content to send")
@@ -320,37 +380,30 @@ class BriefingAgentWorkflow:
             result = self.email.send_email(user_email, subject, email_content)
             
             # Mark articles as sent to user
-            summaries = state.get("summaries", [])
-            for item in summaries:
-                article_id = item.get("article_id")
-                if article_id:
-                    self.database.mark_sent_to_user(user_email, article_id)
+            summaries = state.summaries
+            article_ids = [item["article_id"] for item in summaries if item.get("article_id")]
+            self.database.mark_sent_batch(user_email, article_ids)
             
-            state["metadata"]["email_sent"] = True
-            state["metadata"]["email_message_id"] = result.get("message_id")
+            state.metadata["email_sent"] = True
+            state.metadata["email_message_id"] = result.get("message_id")
             
             logger.info(f"Email sent to {user_email}")
-            
+        
         except Exception as e:
             logger.error(f"Email sending failed: {str(e)}")
-            state["errors"].append(f"Email error: {str(e)}")
-            state["metadata"]["email_sent"] = False
+            state.errors.append(f"Email error: {str(e)}")
+            state.metadata["email_sent"] = False
         
         return state
     
     def should_continue_after_calendar(self, state: AgentState) -> Literal["continue", "skip"]:
         """Conditional: Continue after calendar check?"""
-        passed = state.get("metadata", {}).get("calendar_check_passed", False)
+        passed = state.metadata.get("calendar_check_passed", False)
         return "continue" if passed else "skip"
     
-    def should_continue_after_search(self, state: AgentState) -> Literal["continue", "skip"]:
-        """Conditional: Continue after search?"""
-        articles = state.get("articles", [])
-        return "continue" if articles else "skip"
-    
     def should_continue_after_summarize(self, state: AgentState) -> Literal["continue", "skip"]:
         """Conditional: Continue after summarize?"""
-        summaries = state.get("summaries", [])
+        summaries = state.summaries
         return "continue" if summaries else "skip"
 
 
@@ -363,3 +416,26 @@ def create_agent():
     """
     workflow = BriefingAgentWorkflow()
     return workflow.app
+
+
+async def arun_for_users(app: Any, states: List[AgentState]) -> List[Any]:
+    """
+    Run the compiled agent for many users concurrently.
+    
+    Per-user wall-clock time stays roughly constant up to MAX_CONCURRENT_USERS;
+    one user's failure does not cancel the others.
+    
+    Args:
+        app: Compiled LangGraph application (from create_agent, compiled once)
+        states: Initial state for each user
+    
+    Returns:
+        Final state dict per user, in input order (or the exception that user's run raised)
+    """
+    semaphore = asyncio.Semaphore(max(1, config.MAX_CONCURRENT_USERS))
+    
+    async def run_user(state: AgentState) -> Dict[str, Any]:
+        async with semaphore:
+            return await app.ainvoke(state)
+    
+    return await asyncio.gather(*(run_user(state) for state in states), return_exceptions=True)
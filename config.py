@@ -31,12 +31,32 @@ class Config:
     SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
     SMTP_USERNAME = os.getenv("SMTP_USERNAME", "")
     SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+    SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))  # seconds, per socket operation
+    
+    # DynamoDB Configuration (in-memory mock storage unless enabled)
+    DYNAMODB_ENABLED = os.getenv("DYNAMODB_ENABLED", "false").lower() == "true"
     
     # DynamoDB Table Names
     DYNAMODB_NEWS_ARTICLES_TABLE = os.getenv("DYNAMODB_NEWS_ARTICLES_TABLE", "news_articles")
     DYNAMODB_USER_SUMMARIES_TABLE = os.getenv("DYNAMODB_USER_SUMMARIES_TABLE", "user_summaries")
     DYNAMODB_USER_PREFERENCES_TABLE = os.getenv("DYNAMODB_USER_PREFERENCES_TABLE", "user_preferences")
     
+    # Summary cache (SQLite file survives restarts; empty = in-memory only)
+    SUMMARY_CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH", "")
+    SUMMARY_CACHE_TTL = int(os.getenv("SUMMARY_CACHE_TTL", "86400"))  # seconds
+    
+    # Article hash file for cross-run dedup without DynamoDB (empty = current run only)
+    ARTICLE_HASHES_PATH = os.getenv("ARTICLE_HASHES_PATH", "")
+    
+    # Near-duplicate filter (cosine similarity of title + lead text; 1.0 = exact matches only)
+    NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.9"))
+    
+    # Users whose workflows run at the same time when fanning out over many users
+    MAX_CONCURRENT_USERS = int(os.getenv("MAX_CONCURRENT_USERS", "10"))
+    
+    # Tavily requests in flight at once (stay at or below the HTTP pool size of 10)
+    MAX_CONCURRENT_SEARCHES = int(os.getenv("MAX_CONCURRENT_SEARCHES", "5"))
+    
     @classmethod
     def validate(cls) -> bool:
         """Validate that required configuration is present."""
@@ -1,8 +1,10 @@
 """Main entry point for the AI Briefing Agent."""
+import asyncio
 import logging
 from datetime import datetime
-import pytz
-from agent import create_agent
+from typing import Any, Dict
+from zoneinfo import ZoneInfo
+from agent import arun_for_users, create_agent
 from agent.state import AgentState
 from config import config
 
@@ -24,8 +26,10 @@ def main():
     # Create agent
     app = create_agent()
     
-    # Get user email from config or use default
-    user_email = config.TEST_EMAIL_RECIPIENT or "user@example.com"
+    # Get user emails from config (comma-separated) or use default
+    user_emails = [
+        email.strip() for email in config.TEST_EMAIL_RECIPIENT.split(",") if email.strip()
+    ] or ["user@example.com"]
     
     # Log configuration status
     if not config.TEST_EMAIL_RECIPIENT:
@@ -43,76 +47,81 @@ def main():
     # Get user preferences from environment or use defaults
     # For testing, set schedule_time to current time in user's timezone
     user_timezone = "America/New_York"
-    tz = pytz.timezone(user_timezone)
-    current_time_in_tz = datetime.now(tz)
+    current_time_in_tz = datetime.now(ZoneInfo(user_timezone))
     current_time_str = current_time_in_tz.strftime("%H:%M")
     
-    # Sample initial state
-    initial_state: AgentState = {
-        "user_email": user_email,  # Use email from .env file
-        "user_preferences": {
-            "topics": ["artificial intelligence", "technology"],
-            "timezone": user_timezone,
-            "schedule_time": current_time_str,
-        },
-        "search_queries": [],
-        "articles": [],
-        "deduplicated_articles": [],
-        "summaries": [],
-        "email_content": "",
-        "errors": [],
-        "metadata": {},
-    }
+    # Sample initial state per user
+    initial_states = [
+        AgentState(
+            user_email=user_email,  # Use email from .env file
+            user_preferences={
+                "topics": ["artificial intelligence", "technology"],
+                "timezone": user_timezone,
+                "schedule_time": current_time_str,
+            },
+        )
+        for user_email in user_emails
+    ]
     
-    logger.info(f"User Email: {initial_state['user_email']}")
-    logger.info(f"Topics: {initial_state['user_preferences']['topics']}")
+    logger.info(f"User Emails: {', '.join(user_emails)}")
+    logger.info(f"Topics: {initial_states[0].user_preferences['topics']}")
     logger.info(f"Timezone: {user_timezone}")
     logger.info(f"Scheduled Time: {current_time_str}")
     logger.info("-" * 80)
     
     try:
-        # Run workflow
-        final_state = app.invoke(initial_state)
-        
-        # Display results
-        logger.info("\n" + "=" * 80)
-        logger.info("WORKFLOW COMPLETED")
-        logger.info("=" * 80)
-        logger.info(f"Search Queries: {final_state.get('search_queries', [])}")
-        logger.info(f"Articles Found: {len(final_state.get('articles', []))}")
-        logger.info(f"Articles After Dedup: {len(final_state.get('deduplicated_articles', []))}")
-        logger.info(f"Summaries Generated: {len(final_state.get('summaries', []))}")
-        logger.info(f"Errors: {final_state.get('errors', [])}")
-        
-        if final_state.get('summaries'):
-            logger.info("\nArticle Summaries:")
-            for i, summary in enumerate(final_state['summaries'], 1):
-                logger.info(f"\n{i}. {summary.get('title', 'N/A')}")
-                logger.info(f"   {summary.get('summary', 'N/A')}")
-                logger.info(f"   {summary.get('url', 'N/A')}")
-        
-        if final_state.get('email_content'):
-            logger.info(f"\nEmail Content Length: {len(final_state['email_content'])} characters")
-            logger.info(f"Email Preview: {final_state['email_content'][:300]}...")
-        
-        logger.info("\n" + "=" * 80)
-        
-        # Check if email was sent
-        if final_state.get("metadata", {}).get("email_sent"):
-            logger.info("✓ Email sent successfully!")
-            if final_state.get("metadata", {}).get("email_message_id"):
-                logger.info(f"Message ID: {final_state['metadata']['email_message_id']}")
-        else:
-            logger.info("⚠ Email was not sent (check errors above)")
-        
-        logger.info("Agent execution completed successfully!")
-        logger.info("=" * 80)
-        
+        # Run the workflow for every user concurrently on the one compiled graph
+        final_states = asyncio.run(arun_for_users(app, initial_states))
     except Exception as e:
         logger.error(f"Workflow failed: {str(e)}", exc_info=True)
         return 1
     
-    return 0
+    failures = 0
+    for user_email, final_state in zip(user_emails, final_states):
+        if isinstance(final_state, Exception):
+            logger.error(f"Workflow failed for {user_email}: {str(final_state)}", exc_info=final_state)
+            failures += 1
+            continue
+        log_result(user_email, final_state)
+    
+    logger.info("Agent execution completed successfully!" if not failures else f"Agent execution failed for {failures} user(s)")
+    logger.info("=" * 80)
+    
+    return 1 if failures else 0
+
+
+def log_result(user_email: str, final_state: Dict[str, Any]) -> None:
+    """Log the outcome of one user's workflow run."""
+    # Display results
+    logger.info("\n" + "=" * 80)
+    logger.info(f"WORKFLOW COMPLETED: {user_email}")
+    logger.info("=" * 80)
+    logger.info(f"Search Queries: {final_state.get('search_queries', [])}")
+    logger.info(f"Articles Found: {len(final_state.get('articles', []))}")
+    logger.info(f"Articles After Dedup: {len(final_state.get('deduplicated_articles', []))}")
+    logger.info(f"Summaries Generated: {len(final_state.get('summaries', []))}")
+    logger.info(f"Errors: {final_state.get('errors', [])}")
+    
+    if final_state.get('summaries'):
+        logger.info("\nArticle Summaries:")
+        for i, summary in enumerate(final_state['summaries'], 1):
+            logger.info(f"\n{i}. {summary.get('title', 'N/A')}")
+            logger.info(f"   {summary.get('summary', 'N/A')}")
+            logger.info(f"   {summary.get('url', 'N/A')}")
+    
+    if final_state.get('email_content'):
+        logger.info(f"\nEmail Content Length: {len(final_state['email_content'])} characters")
+        logger.info(f"Email Preview: {final_state['email_content'][:300]}...")
+    
+    logger.info("\n" + "=" * 80)
+    
+    # Check if email was sent
+    if final_state.get("metadata", {}).get("email_sent"):
+        logger.info("✓ Email sent successfully!")
+        if final_state.get("metadata", {}).get("email_message_id"):
+            logger.info(f"Message ID: {final_state['metadata']['email_message_id']}")
+    else:
+        logger.info("⚠ Email was not sent (check errors above)")
 
 
 if __name__ == "__main__":
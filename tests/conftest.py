@@ -1,58 +1,67 @@
 """Pytest configuration and shared fixtures."""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
 import pytest
 import os
+import socket
+import ssl
 from unittest.mock import Mock, MagicMock, patch
 from typing import Dict, Any
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
 from agent.state import AgentState
 
 
-@pytest.fixture(autouse=True)
-def mock_config(monkeypatch):
-    """Mock configuration for testing - patches config for all tools."""
+# Test values for config attributes, applied once per session by mock_config
+_CONFIG_OVERRIDES: Dict[str, Any] = {
+    "GROQ_API_KEY": "test_groq_key",
+    "GROQ_MODEL": "llama-3.1-70b-versatile",
+    "TAVILY_API_KEY": "test_tavily_key",
+    "AWS_ACCESS_KEY_ID": "test_aws_key",
+    "AWS_SECRET_ACCESS_KEY": "test_aws_secret",
+    "AWS_REGION": "us-east-1",
+    "SES_FROM_EMAIL": "test@example.com",
+    "DYNAMODB_NEWS_ARTICLES_TABLE": "news_articles",
+    "DYNAMODB_USER_SUMMARIES_TABLE": "user_summaries",
+    "DYNAMODB_USER_PREFERENCES_TABLE": "user_preferences",
+}
+
+
+@pytest.fixture(scope="session", autouse=True)
+def mock_config():
+    """Mock configuration for testing - patches config for all tools, once per session."""
     import config
-    import agent.tools.tavily_tool
-    import agent.tools.groq_tool
-    import agent.tools.email_tool
-    
-    # Patch the config object directly (since tools import 'from config import config')
-    monkeypatch.setattr(config.config, 'GROQ_API_KEY', "test_groq_key")
-    monkeypatch.setattr(config.config, 'GROQ_MODEL', "llama-3.1-70b-versatile")
-    monkeypatch.setattr(config.config, 'TAVILY_API_KEY', "test_tavily_key")
-    monkeypatch.setattr(config.config, 'AWS_ACCESS_KEY_ID', "test_aws_key")
-    monkeypatch.setattr(config.config, 'AWS_SECRET_ACCESS_KEY', "test_aws_secret")
-    monkeypatch.setattr(config.config, 'AWS_REGION', "us-east-1")
-    monkeypatch.setattr(config.config, 'SES_FROM_EMAIL', "test@example.com")
-    monkeypatch.setattr(config.config, 'DYNAMODB_NEWS_ARTICLES_TABLE', "news_articles")
-    monkeypatch.setattr(config.config, 'DYNAMODB_USER_SUMMARIES_TABLE', "user_summaries")
-    monkeypatch.setattr(config.config, 'DYNAMODB_USER_PREFERENCES_TABLE', "user_preferences")
-    
-    # Also patch the config object in tool modules (they import it, so we need to patch the same object)
-    monkeypatch.setattr(agent.tools.tavily_tool.config, 'TAVILY_API_KEY', "test_tavily_key")
-    monkeypatch.setattr(agent.tools.groq_tool.config, 'GROQ_API_KEY', "test_groq_key")
-    monkeypatch.setattr(agent.tools.groq_tool.config, 'GROQ_MODEL', "llama-3.1-70b-versatile")
-    monkeypatch.setattr(agent.tools.email_tool.config, 'SES_FROM_EMAIL', "test@example.com")
     
+    # Tools import 'from config import config', so patching the shared object covers them all
+    with pytest.MonkeyPatch.context() as mp:
+        for name, value in _CONFIG_OVERRIDES.items():
+            mp.setattr(config.config, name, value)
+        yield mp
+
+
+@pytest.fixture(autouse=True)
+def reset_groq_client():
+    """Tests patch ChatGroq per test, so don't let a shared client leak between them."""
+    import agent.tools.groq_tool
+    agent.tools.groq_tool._make_chat_groq.cache_clear()
     yield
 
 
 @pytest.fixture
 def sample_agent_state() -> AgentState:
     """Sample agent state for testing."""
-    return {
-        "user_email": "test@example.com",
-        "user_preferences": {
+    return AgentState(
+        user_email="test@example.com",
+        user_preferences={
             "topics": ["artificial intelligence", "technology"],
             "timezone": "America/New_York",
             "schedule_time": "09:00",
         },
-        "search_queries": [],
-        "articles": [],
-        "deduplicated_articles": [],
-        "summaries": [],
-        "email_content": "",
-        "errors": [],
-        "metadata": {},
-    }
+    )
 
 
 @pytest.fixture
@@ -65,7 +74,6 @@ def sample_articles():
             "content": "Scientists have made significant progress...",
             "published_date": "2024-01-15",
             "score": 0.95,
-            "raw_content": "Full article content here...",
         },
         {
             "title": "New Technology Trends for 2024",
@@ -73,7 +81,6 @@ def sample_articles():
             "content": "Technology continues to evolve rapidly...",
             "published_date": "2024-01-14",
             "score": 0.88,
-            "raw_content": "Full article content here...",
         },
     ]
 
@@ -123,7 +130,110 @@ def mock_tavily_client():
 def mock_groq_llm():
     """Mock Groq LLM."""
     mock_llm = Mock()
-    mock_response = Mock()
-    mock_response.content = "Mock LLM response"
+    mock_response = SimpleNamespace(content="Mock LLM response")
     mock_llm.invoke.return_value = mock_response
     return mock_llm
+
+
+@pytest.fixture
+def client_classes(monkeypatch):
+    """Replace the Tavily and Groq client classes; returns the (TavilyClient, ChatGroq) mocks."""
+    mock_tavily_class = Mock(return_value=Mock())
+    mock_groq_class = Mock(return_value=Mock())
+    monkeypatch.setattr('agent.tools.tavily_tool.TavilyClient', mock_tavily_class)
+    monkeypatch.setattr('agent.tools.groq_tool.ChatGroq', mock_groq_class)
+    return mock_tavily_class, mock_groq_class
+
+
+@pytest.fixture
+def mock_tavily(client_classes):
+    """Mock Tavily client the tools will use."""
+    return client_classes[0].return_value
+
+
+@pytest.fixture
+def mock_llm(client_classes):
+    """Mock ChatGroq instance the tools will use."""
+    return client_classes[1].return_value
+
+
+@pytest.fixture
+def mock_calendar(monkeypatch):
+    """Replace the send-time check; passes unless a test changes return_value."""
+    mock_validate = Mock(return_value=True)
+    monkeypatch.setattr('agent.tools.calendar_tool.CalendarTool.validate_send_time', mock_validate)
+    return mock_validate
+
+
+def _self_signed_tls_context(directory) -> ssl.SSLContext:
+    """Server TLS context for a throwaway localhost certificate."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.now(timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    cert_path, key_path = directory / "cert.pem", directory / "key.pem"
+    cert_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.TraditionalOpenSSL,
+        serialization.NoEncryption(),
+    ))
+    
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert_path, key_path)
+    return context
+
+
+class _SMTPSink:
+    """aiosmtpd handler that records every delivered envelope."""
+    
+    def __init__(self):
+        self.envelopes = []
+        self.peers = set()  # client (host, port) per connection that delivered mail
+    
+    async def handle_DATA(self, server, session, envelope):
+        self.envelopes.append(envelope)
+        self.peers.add(session.peer)
+        return "250 Message accepted"
+
+
+@pytest.fixture
+def smtp_sink(tmp_path, monkeypatch):
+    """In-process SMTP server (STARTTLS + AUTH, accepts any login) wired into config in place of SES."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    
+    sink = _SMTPSink()
+    controller = Controller(
+        sink,
+        hostname="127.0.0.1",
+        port=port,
+        tls_context=_self_signed_tls_context(tmp_path),
+        require_starttls=True,
+        authenticator=lambda *args: AuthResult(success=True),
+    )
+    controller.start()
+    
+    import config
+    for name, value in {
+        "AWS_ACCESS_KEY_ID": "",
+        "SMTP_ENABLED": True,
+        "SMTP_SERVER": "127.0.0.1",
+        "SMTP_PORT": port,
+        "SMTP_USERNAME": "user",
+        "SMTP_PASSWORD": "password",
+    }.items():
+        monkeypatch.setattr(config.config, name, value)
+    
+    yield sink
+    controller.stop()
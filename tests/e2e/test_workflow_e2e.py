@@ -1,43 +1,46 @@
 """End-to-end tests for the complete workflow."""
+import asyncio
+import itertools
+from dataclasses import replace
+from types import SimpleNamespace
 import pytest
-from unittest.mock import Mock, patch, MagicMock
-from agent import create_agent
+from unittest.mock import AsyncMock
+from agent import arun_for_users, create_agent
 from agent.state import AgentState
+from agent.workflow import BriefingAgentWorkflow
+from agent.tools.groq_tool import Briefing
+
+
+def _user_state(state: AgentState, email: str) -> AgentState:
+    """Copy a state for another user without sharing its mutable metadata and errors."""
+    return replace(state, user_email=email, metadata={}, errors=[])
 
 
 @pytest.mark.e2e
 class TestWorkflowE2E:
     """End-to-end tests for the complete agent workflow."""
     
-    @patch('agent.tools.calendar_tool.CalendarTool.validate_send_time')
-    @patch('agent.tools.tavily_tool.TavilyClient')
-    @patch('agent.tools.groq_tool.ChatGroq')
-    def test_full_workflow_success(self, mock_groq_class, mock_tavily_class, mock_calendar, mock_config, sample_agent_state, sample_articles):
+    def test_full_workflow_success(self, mock_tavily, mock_llm, mock_calendar, sample_agent_state, sample_articles):
         """Test complete workflow from start to finish."""
-        # Mock calendar check to always pass
-        mock_calendar.return_value = True
-        
         # Setup Tavily mock
-        mock_tavily_client = Mock()
-        mock_tavily_class.return_value = mock_tavily_client
-        mock_tavily_client.search.return_value = {"results": sample_articles}
-        
-        # Setup Groq mock with different responses for different calls
-        mock_llm = Mock()
-        mock_groq_class.return_value = mock_llm
-        
-        # Mock responses for different LLM calls
-        mock_responses = [
-            Mock(content="AI news\ntechnology trends"),  # analyze_preferences
-            Mock(content="TLDR: Major AI breakthrough announced"),  # summarize_article 1
-            Mock(content="TLDR: New tech trends emerge"),  # summarize_article 2
-            Mock(content="<html><body><h2>Your Daily Briefing</h2><ul><li>Article 1</li><li>Article 2</li></ul></body></html>"),  # generate_email_content
-        ]
-        mock_llm.invoke.side_effect = mock_responses
+        mock_tavily.search.return_value = {"results": sample_articles}
+        
+        # Setup Groq mock with one response per entry point
+        # analyze_preferences
+        mock_llm.invoke.return_value = SimpleNamespace(content="AI news\ntechnology trends")
+        # generate_email_content
+        mock_llm.with_structured_output.return_value.invoke.return_value = Briefing(
+            greeting="Good morning!", items=[], closing="Until tomorrow."
+        )
+        # asummarize_articles
+        mock_llm.ainvoke = AsyncMock(return_value=SimpleNamespace(
+            content='[{"index": 0, "summary": "TLDR: Major AI breakthrough announced"}, '
+                    '{"index": 1, "summary": "TLDR: New tech trends emerge"}]'
+        ))
         
         # Create and run agent
         app = create_agent()
-        final_state = app.invoke(sample_agent_state)
+        final_state = asyncio.run(app.ainvoke(sample_agent_state))
         
         # Verify workflow completed
         assert "search_queries" in final_state
@@ -48,28 +51,17 @@ class TestWorkflowE2E:
         assert len(final_state["email_content"]) > 0
         assert "metadata" in final_state
     
-    @patch('agent.tools.calendar_tool.CalendarTool.validate_send_time')
-    @patch('agent.tools.tavily_tool.TavilyClient')
-    @patch('agent.tools.groq_tool.ChatGroq')
-    def test_workflow_with_no_articles(self, mock_groq_class, mock_tavily_class, mock_calendar, mock_config, sample_agent_state):
+    def test_workflow_with_no_articles(self, mock_tavily, mock_llm, mock_calendar, sample_agent_state):
         """Test workflow when no articles are found."""
-        # Mock calendar check to always pass
-        mock_calendar.return_value = True
-        
         # Setup mocks
-        mock_tavily_client = Mock()
-        mock_tavily_class.return_value = mock_tavily_client
-        mock_tavily_client.search.return_value = {"results": []}
+        mock_tavily.search.return_value = {"results": []}
         
-        mock_llm = Mock()
-        mock_response = Mock()
-        mock_response.content = "AI news\ntechnology trends"
+        mock_response = SimpleNamespace(content="AI news\ntechnology trends")
         mock_llm.invoke.return_value = mock_response
-        mock_groq_class.return_value = mock_llm
         
         # Run workflow
         app = create_agent()
-        final_state = app.invoke(sample_agent_state)
+        final_state = asyncio.run(app.ainvoke(sample_agent_state))
         
         # Should have queries but no articles
         assert len(final_state.get("search_queries", [])) > 0
@@ -77,74 +69,59 @@ class TestWorkflowE2E:
         # Workflow should skip to end when no articles found
         assert "metadata" in final_state
     
-    @patch('agent.tools.tavily_tool.TavilyClient')
-    @patch('agent.tools.groq_tool.ChatGroq')
-    def test_workflow_with_duplicates(self, mock_groq_class, mock_tavily_class, mock_config, sample_agent_state, sample_articles):
+    def test_workflow_with_duplicates(self, mock_tavily, mock_llm, mock_calendar, sample_agent_state, sample_articles):
         """Test workflow with duplicate articles."""
         # Setup mocks
-        mock_tavily_client = Mock()
-        mock_tavily_class.return_value = mock_tavily_client
-        mock_tavily_client.search.return_value = {"results": sample_articles}
-        
-        mock_llm = Mock()
-        mock_responses = [
-            Mock(content="AI news"),
-            Mock(content="Summary 1"),
-            Mock(content="Summary 2"),
-            Mock(content="<html><body>Email</body></html>"),
-        ]
-        mock_llm.invoke.side_effect = mock_responses
-        mock_groq_class.return_value = mock_llm
-        
-        # Run workflow first time
-        app = create_agent()
-        final_state1 = app.invoke(sample_agent_state)
-        
-        # Run workflow second time with same articles (should be deduplicated)
-        final_state2 = app.invoke(sample_agent_state)
-        
-        # Second run should have fewer or no new articles after deduplication
-        assert len(final_state2.get("deduplicated_articles", [])) <= len(final_state1.get("deduplicated_articles", []))
+        mock_tavily.search.return_value = {"results": sample_articles}
+        
+        mock_llm.invoke.return_value = SimpleNamespace(content="AI news")
+        mock_llm.ainvoke = AsyncMock(return_value=SimpleNamespace(content="Summary 1\nSummary 2"))
+        
+        # Run workflow once; it stores the articles and marks them sent
+        workflow = BriefingAgentWorkflow()
+        final_state = asyncio.run(workflow.app.ainvoke(sample_agent_state))
+        assert len(final_state["deduplicated_articles"]) == len(sample_articles)
+        
+        # Same articles again: the fetch node alone decides, so no second full run is needed
+        mock_tavily.search.return_value = {"results": [dict(article) for article in sample_articles]}
+        state = AgentState(
+            user_email=sample_agent_state.user_email,
+            search_queries=["AI news"],
+        )
+        state = asyncio.run(workflow.fetch_dedup_summarize_node(state))
+        
+        assert state.deduplicated_articles == []
+        assert state.metadata["duplicates_filtered"] == len(sample_articles)
     
-    @patch('agent.tools.tavily_tool.TavilyClient')
-    @patch('agent.tools.groq_tool.ChatGroq')
-    def test_workflow_error_handling(self, mock_groq_class, mock_tavily_class, mock_config, sample_agent_state):
+    def test_workflow_error_handling(self, mock_tavily, mock_llm, mock_calendar, sample_agent_state):
         """Test workflow error handling."""
         # Setup mocks to fail
-        mock_tavily_client = Mock()
-        mock_tavily_class.return_value = mock_tavily_client
-        mock_tavily_client.search.side_effect = Exception("API Error")
+        mock_tavily.search.side_effect = Exception("API Error")
         
-        mock_llm = Mock()
         mock_llm.invoke.side_effect = Exception("LLM Error")
-        mock_groq_class.return_value = mock_llm
         
         # Run workflow
         app = create_agent()
-        final_state = app.invoke(sample_agent_state)
-        
-        # Should have errors recorded
-        assert len(final_state.get("errors", [])) > 0
-        assert "metadata" in final_state
+        final_state = asyncio.run(app.ainvoke(sample_agent_state))
+        
+        # Query analysis falls back to topic queries; every search then fails,
+        # so the run ends after the fetch node with nothing to store or send
+        errors = final_state["errors"]
+        assert any(error.startswith("Search error") for error in errors)
+        assert final_state["search_queries"] == ["artificial intelligence news", "technology news"]
+        assert final_state["summaries"] == []
+        assert "articles_stored" not in final_state["metadata"]
+        assert "email_sent" not in final_state["metadata"]
     
-    @patch('agent.tools.tavily_tool.TavilyClient')
-    @patch('agent.tools.groq_tool.ChatGroq')
-    def test_workflow_calendar_check_skip(self, mock_groq_class, mock_tavily_class, mock_config, sample_agent_state):
+    def test_workflow_calendar_check_skip(self, client_classes, sample_agent_state):
         """Test workflow skipping when calendar check fails."""
-        # Setup mocks
-        mock_tavily_client = Mock()
-        mock_tavily_class.return_value = mock_tavily_client
-        
-        mock_llm = Mock()
-        mock_groq_class.return_value = mock_llm
-        
         # Modify state to have invalid schedule time (far in future)
-        sample_agent_state["user_preferences"]["schedule_time"] = "23:59"
-        sample_agent_state["user_preferences"]["timezone"] = "UTC"
+        sample_agent_state.user_preferences["schedule_time"] = "23:59"
+        sample_agent_state.user_preferences["timezone"] = "UTC"
         
         # Run workflow
         app = create_agent()
-        final_state = app.invoke(sample_agent_state)
+        final_state = asyncio.run(app.ainvoke(sample_agent_state))
         
         # Should have calendar check metadata
         assert "metadata" in final_state
@@ -152,3 +129,100 @@ class TestWorkflowE2E:
         calendar_passed = final_state.get("metadata", {}).get("calendar_check_passed", True)
         # Note: Calendar check may pass if within tolerance, so we just verify it was checked
         assert "calendar_check_passed" in final_state.get("metadata", {})
+    
+    def test_run_for_many_users(self, client_classes, mock_calendar, sample_agent_state):
+        """Test one compiled graph serving several users concurrently."""
+        # Calendar check fails, so each user's run ends after the first node
+        mock_calendar.return_value = False
+        
+        states = [
+            _user_state(sample_agent_state, "a@example.com"),
+            _user_state(sample_agent_state, "b@example.com"),
+        ]
+        
+        app = create_agent()
+        final_states = asyncio.run(arun_for_users(app, states))
+        
+        assert [state["user_email"] for state in final_states] == ["a@example.com", "b@example.com"]
+        assert all(state["metadata"]["calendar_check_passed"] is False for state in final_states)
+        assert mock_calendar.call_count == 2
+    
+    def test_run_for_many_users_full_pipeline(self, mock_tavily, mock_llm, mock_calendar, sample_agent_state, sample_articles):
+        """Test several users running through fetch and summarize share one event loop."""
+        # Fresh URLs per search, so every user misses the shared summary cache
+        searches = itertools.count()
+        mock_tavily.search.side_effect = lambda **kwargs: {"results": [
+            dict(article, url=f"{article['url']}?run={next(searches)}") for article in sample_articles
+        ]}
+        mock_llm.invoke.return_value = SimpleNamespace(content="AI news")
+        mock_llm.with_structured_output.return_value.invoke.return_value = Briefing(
+            greeting="Hi!", items=[], closing="Bye."
+        )
+        
+        # The async Groq client's connection pool belongs to one loop; record where it is used
+        loops = set()
+        
+        async def ainvoke(messages, **kwargs):
+            loops.add(asyncio.get_running_loop())
+            await asyncio.sleep(0)
+            return SimpleNamespace(content="Summary 1\nSummary 2")
+        
+        mock_llm.ainvoke = AsyncMock(side_effect=ainvoke)
+        
+        emails = [f"user{i}@example.com" for i in range(4)]
+        states = [_user_state(sample_agent_state, email) for email in emails]
+        
+        app = create_agent()
+        final_states = asyncio.run(arun_for_users(app, states))
+        
+        assert [state["user_email"] for state in final_states] == emails
+        assert all(len(state["summaries"]) == len(sample_articles) for state in final_states)
+        assert all(state["metadata"]["email_sent"] is True for state in final_states)
+        assert mock_llm.ainvoke.await_count == len(emails)
+        assert len(loops) == 1
+    
+    def test_run_for_many_users_same_articles(self, mock_tavily, mock_llm, mock_calendar, sample_agent_state, sample_articles, monkeypatch):
+        """Test users interested in the same topic all receive the same articles."""
+        # One user at a time, so later users run after earlier ones stored the articles
+        monkeypatch.setattr('config.config.MAX_CONCURRENT_USERS', 1)
+        mock_tavily.search.return_value = {"results": sample_articles}
+        mock_llm.invoke.return_value = SimpleNamespace(content="AI news")
+        mock_llm.with_structured_output.return_value.invoke.return_value = Briefing(
+            greeting="Hi!", items=[], closing="Bye."
+        )
+        mock_llm.ainvoke = AsyncMock(return_value=SimpleNamespace(content="Summary 1\nSummary 2"))
+        
+        emails = [f"user{i}@example.com" for i in range(3)]
+        states = [_user_state(sample_agent_state, email) for email in emails]
+        
+        app = create_agent()
+        final_states = asyncio.run(arun_for_users(app, states))
+        
+        for state in final_states:
+            assert [s["url"] for s in state["summaries"]] == [a["url"] for a in sample_articles]
+            assert state["metadata"]["duplicates_filtered"] == 0
+            assert state["metadata"]["email_sent"] is True
+            assert state["errors"] == []
+    
+    def test_run_for_many_users_shares_summary_cache(self, mock_tavily, mock_llm, mock_calendar, sample_agent_state, sample_articles, monkeypatch):
+        """Test later users reuse summaries cached by an earlier user's run."""
+        monkeypatch.setattr('config.config.MAX_CONCURRENT_USERS', 1)
+        mock_tavily.search.return_value = {"results": sample_articles}
+        mock_llm.invoke.return_value = SimpleNamespace(content="AI news")
+        mock_llm.with_structured_output.return_value.invoke.return_value = Briefing(
+            greeting="Hi!", items=[], closing="Bye."
+        )
+        mock_llm.ainvoke = AsyncMock(return_value=SimpleNamespace(content="Summary 1\nSummary 2"))
+        
+        emails = [f"user{i}@example.com" for i in range(3)]
+        states = [_user_state(sample_agent_state, email) for email in emails]
+        
+        app = create_agent()
+        final_states = asyncio.run(arun_for_users(app, states))
+        
+        assert [state["metadata"]["summaries_cached"] for state in final_states] == [0, 2, 2]
+        assert all(
+            [s["summary"] for s in state["summaries"]] == ["Summary 1", "Summary 2"]
+            for state in final_states
+        )
+        mock_llm.ainvoke.assert_awaited_once()
@@ -1,4 +1,5 @@
 """Integration tests for tool interactions."""
+from types import SimpleNamespace
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 from agent.tools import TavilyTool, GroqTool, DatabaseTool, EmailTool, CalendarTool
@@ -19,8 +20,7 @@ class TestToolIntegration:
         
         # Setup Groq mock
         mock_llm = Mock()
-        mock_response = Mock()
-        mock_response.content = "TLDR: Test summary"
+        mock_response = SimpleNamespace(content="TLDR: Test summary")
         mock_llm.invoke.return_value = mock_response
         mock_groq.return_value = mock_llm
         
@@ -60,8 +60,7 @@ class TestToolIntegration:
         """Test Groq and Database tools working together."""
         # Setup Groq mock
         mock_llm = Mock()
-        mock_response = Mock()
-        mock_response.content = "<html><body>Email content</body></html>"
+        mock_response = SimpleNamespace(content="<html><body>Email content</body></html>")
         mock_llm.invoke.return_value = mock_response
         mock_groq_class.return_value = mock_llm
         
@@ -90,8 +89,7 @@ class TestToolIntegration:
         mock_tavily_client.search.return_value = {"results": sample_articles}
         
         mock_llm = Mock()
-        mock_response = Mock()
-        mock_response.content = "Test summary"
+        mock_response = SimpleNamespace(content="Test summary")
         mock_llm.invoke.return_value = mock_response
         mock_groq_class.return_value = mock_llm
         
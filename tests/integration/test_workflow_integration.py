@@ -1,165 +1,219 @@
 """Integration tests for workflow nodes."""
+import asyncio
+from dataclasses import replace
+from types import SimpleNamespace
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import AsyncMock
 from agent.workflow import BriefingAgentWorkflow
-from agent.state import AgentState
+from agent.tools.database_tool import DatabaseTool
+from agent.tools.groq_tool import Briefing
+
+
+@pytest.fixture
+def workflow(client_classes):
+    """Workflow built against the patched clients."""
+    return BriefingAgentWorkflow()
 
 
 @pytest.mark.integration
 class TestWorkflowIntegration:
     """Integration tests for workflow nodes."""
     
-    @patch('agent.tools.tavily_tool.TavilyClient')
-    @patch('agent.tools.groq_tool.ChatGroq')
-    def test_calendar_check_node(self, mock_groq_class, mock_tavily_class, mock_config, sample_agent_state):
+    def test_calendar_check_node(self, workflow, sample_agent_state):
         """Test calendar check node."""
-        mock_tavily_client = Mock()
-        mock_tavily_class.return_value = mock_tavily_client
-        
-        mock_llm = Mock()
-        mock_groq_class.return_value = mock_llm
+        state = workflow.calendar_check_node(replace(sample_agent_state))
         
+        assert "calendar_check_passed" in state.metadata
+    
+    def test_tools_created_lazily(self, client_classes, sample_agent_state):
+        """Test API clients are not built until a node needs them."""
+        mock_tavily_class, mock_groq_class = client_classes
         workflow = BriefingAgentWorkflow()
-        state = workflow.calendar_check_node(sample_agent_state.copy())
+        workflow.calendar_check_node(replace(sample_agent_state))
         
-        assert "metadata" in state
-        assert "calendar_check_passed" in state["metadata"]
+        mock_groq_class.assert_not_called()
+        mock_tavily_class.assert_not_called()
+        
+        assert workflow.groq is workflow.groq
+        mock_groq_class.assert_called_once()
     
-    @patch('agent.tools.tavily_tool.TavilyClient')
-    @patch('agent.tools.groq_tool.ChatGroq')
-    def test_query_analysis_node(self, mock_groq_class, mock_tavily_class, mock_config, sample_agent_state):
+    def test_query_analysis_node(self, workflow, mock_llm, sample_agent_state):
         """Test query analysis node."""
-        mock_tavily_client = Mock()
-        mock_tavily_class.return_value = mock_tavily_client
-        
-        mock_llm = Mock()
-        mock_response = Mock()
-        mock_response.content = "AI news\ntechnology trends"
+        mock_response = SimpleNamespace(content="AI news\ntechnology trends")
         mock_llm.invoke.return_value = mock_response
-        mock_groq_class.return_value = mock_llm
-        
-        workflow = BriefingAgentWorkflow()
-        state = workflow.query_analysis_node(sample_agent_state.copy())
         
-        assert len(state["search_queries"]) > 0
-        assert "metadata" in state
-    
-    @patch('agent.tools.tavily_tool.TavilyClient')
-    @patch('agent.tools.groq_tool.ChatGroq')
-    def test_search_node(self, mock_groq_class, mock_tavily_class, mock_config, sample_agent_state, sample_articles):
-        """Test search node."""
-        mock_tavily_client = Mock()
-        mock_tavily_class.return_value = mock_tavily_client
-        mock_tavily_client.search.return_value = {"results": sample_articles}
+        state = workflow.query_analysis_node(replace(sample_agent_state))
         
-        mock_llm = Mock()
-        mock_groq_class.return_value = mock_llm
+        assert len(state.search_queries) > 0
+        assert state.metadata["queries_generated"] == len(state.search_queries)
         
-        workflow = BriefingAgentWorkflow()
-        state = sample_agent_state.copy()
-        state["search_queries"] = ["AI technology"]
-        state = workflow.search_node(state)
+        # Same topics again: queries come from the cache, not the LLM
+        state = workflow.query_analysis_node(replace(sample_agent_state))
+        assert state.search_queries == ["AI news", "technology trends"]
+        assert state.metadata["queries_cached"] is True
         
-        assert len(state["articles"]) > 0
-        assert "metadata" in state
+        # Same topics in another order share the cache entry
+        state = replace(sample_agent_state, user_preferences={"topics": ["technology", "artificial intelligence"]})
+        state = workflow.query_analysis_node(state)
+        assert state.metadata["queries_cached"] is True
+        mock_llm.invoke.assert_called_once()
     
-    @patch('agent.tools.tavily_tool.TavilyClient')
-    @patch('agent.tools.groq_tool.ChatGroq')
-    def test_deduplication_node(self, mock_groq_class, mock_tavily_class, mock_config, sample_agent_state, sample_articles):
-        """Test deduplication node."""
-        mock_tavily_client = Mock()
-        mock_tavily_class.return_value = mock_tavily_client
-        
-        mock_llm = Mock()
-        mock_groq_class.return_value = mock_llm
+    def test_query_analysis_node_caches_only_llm_output(self, workflow, mock_llm, sample_agent_state):
+        """Test fallback queries from a failed LLM call are not cached, but real ones are."""
+        topics = sample_agent_state.user_preferences["topics"]
+        fallback = [f"{topic} news" for topic in topics[:2]]
+        mock_llm.invoke.side_effect = Exception("LLM Error")
+        
+        state = workflow.query_analysis_node(replace(sample_agent_state, errors=[]))
+        assert state.search_queries == fallback
+        assert any(error.startswith("Query analysis error") for error in state.errors)
+        
+        # The LLM happens to answer with the same strings as the fallback: still cached
+        mock_llm.invoke.side_effect = None
+        mock_llm.invoke.return_value = SimpleNamespace(content="\n".join(fallback))
+        state = workflow.query_analysis_node(replace(sample_agent_state, metadata={}))
+        assert "queries_cached" not in state.metadata
+        
+        state = workflow.query_analysis_node(replace(sample_agent_state, metadata={}))
+        assert state.search_queries == fallback
+        assert state.metadata["queries_cached"] is True
+        assert mock_llm.invoke.call_count == 2
+    
+    def test_fetch_node_search(self, workflow, mock_tavily, mock_llm, sample_agent_state, sample_articles):
+        """Test the fetch node collects search results."""
+        mock_tavily.search.return_value = {"results": sample_articles}
+        mock_llm.ainvoke = AsyncMock(return_value=SimpleNamespace(content="TLDR: One\nTLDR: Two"))
         
-        workflow = BriefingAgentWorkflow()
-        state = sample_agent_state.copy()
-        state["articles"] = sample_articles
-        state = workflow.deduplication_node(state)
+        state = replace(sample_agent_state)
+        state.search_queries = ["AI technology"]
+        state = asyncio.run(workflow.fetch_dedup_summarize_node(state))
         
-        assert len(state["deduplicated_articles"]) >= 0
-        assert "metadata" in state
+        assert len(state.articles) > 0
+        assert state.metadata["articles_found"] == len(state.articles)
     
-    @patch('agent.tools.tavily_tool.TavilyClient')
-    @patch('agent.tools.groq_tool.ChatGroq')
-    def test_summarize_node(self, mock_groq_class, mock_tavily_class, mock_config, sample_agent_state, sample_articles):
-        """Test summarize node."""
-        mock_tavily_client = Mock()
-        mock_tavily_class.return_value = mock_tavily_client
-        
-        mock_llm = Mock()
-        mock_response = Mock()
-        mock_response.content = "TLDR: Test summary"
-        mock_llm.invoke.return_value = mock_response
-        mock_groq_class.return_value = mock_llm
+    def test_fetch_node_deduplication(self, workflow, mock_tavily, mock_llm, sample_agent_state, sample_articles):
+        """Test the fetch node drops articles already sent to the user."""
+        mock_tavily.search.return_value = {"results": sample_articles}
+        mock_llm.ainvoke = AsyncMock(return_value=SimpleNamespace(content="TLDR: One\nTLDR: Two"))
+        workflow.database.mark_sent_batch(sample_agent_state.user_email, [sample_articles[0]["url"]])
+        
+        state = replace(sample_agent_state)
+        state.search_queries = ["AI technology"]
+        state = asyncio.run(workflow.fetch_dedup_summarize_node(state))
+        
+        assert [a["url"] for a in state.deduplicated_articles] == [sample_articles[1]["url"]]
+        assert state.metadata["articles_after_dedup"] == 1
+        assert state.metadata["duplicates_filtered"] == 1
+    
+    def test_fetch_node_keeps_articles_stored_for_other_users(self, workflow, mock_tavily, mock_llm, sample_agent_state, sample_articles):
+        """Test articles already in the article store still reach a user who hasn't received them."""
+        mock_tavily.search.return_value = {"results": sample_articles}
+        mock_llm.ainvoke = AsyncMock(return_value=SimpleNamespace(content="TLDR: One\nTLDR: Two"))
+        hashes = workflow.database.get_article_hashes(sample_articles)
+        workflow.database.store_articles_batch(list(zip(hashes, sample_articles)))
+        
+        state = replace(sample_agent_state)
+        state.search_queries = ["AI technology"]
+        state = asyncio.run(workflow.fetch_dedup_summarize_node(state))
+        
+        assert len(state.deduplicated_articles) == len(sample_articles)
+        assert state.metadata["duplicates_filtered"] == 0
+    
+    def test_fetch_dedup_summarize_node(self, workflow, mock_tavily, mock_llm, sample_agent_state, sample_articles):
+        """Test the pipelined search -> dedup -> summarize node."""
+        # Both queries return the same articles; they should only be summarized once
+        mock_tavily.search.return_value = {"results": sample_articles}
+        
+        mock_llm.ainvoke = AsyncMock(return_value=SimpleNamespace(content="TLDR: One\nTLDR: Two"))
+        
+        state = replace(sample_agent_state)
+        state.search_queries = ["AI news", "technology trends"]
+        state = asyncio.run(workflow.fetch_dedup_summarize_node(state))
+        
+        assert len(state.articles) == 2 * len(sample_articles)
+        assert len(state.deduplicated_articles) == len(sample_articles)
+        assert [s["summary"] for s in state.summaries] == ["TLDR: One", "TLDR: Two"]
+        assert state.metadata["duplicates_filtered"] == len(sample_articles)
+        mock_llm.ainvoke.assert_awaited_once()
+    
+    def test_fetch_node_summaries(self, workflow, mock_tavily, mock_llm, sample_agent_state, sample_articles):
+        """Test the fetch node attaches ids and hashes to every summary."""
+        mock_tavily.search.return_value = {"results": sample_articles}
+        mock_llm.ainvoke = AsyncMock(return_value=SimpleNamespace(content="TLDR: Test summary"))
+        
+        state = replace(sample_agent_state)
+        state.search_queries = ["AI technology"]
+        state = asyncio.run(workflow.fetch_dedup_summarize_node(state))
+        
+        assert len(state.summaries) == len(sample_articles)
+        assert state.metadata["summaries_generated"] == len(state.summaries)
+        assert all(s["article_id"] and s["article_hash"] for s in state.summaries)
+    
+    def test_fetch_node_uses_summary_cache(self, workflow, mock_tavily, mock_llm, sample_agent_state, sample_articles):
+        """Test that repeat articles are served from the summary cache."""
+        mock_tavily.search.return_value = {"results": sample_articles}
+        mock_llm.ainvoke = AsyncMock(return_value=SimpleNamespace(content="TLDR: One\nTLDR: Two"))
         
-        workflow = BriefingAgentWorkflow()
-        state = sample_agent_state.copy()
-        state["deduplicated_articles"] = sample_articles
-        for article in state["deduplicated_articles"]:
-            article["article_id"] = article["url"]
-            article["article_hash"] = "test_hash"
+        # Different users, so the second run is not filtered by sent history
+        state = replace(sample_agent_state, user_email="a@example.com", search_queries=["AI technology"])
+        asyncio.run(workflow.fetch_dedup_summarize_node(state))
         
-        state = workflow.summarize_node(state)
+        state = replace(sample_agent_state, user_email="b@example.com", search_queries=["AI technology"])
+        state = asyncio.run(workflow.fetch_dedup_summarize_node(state))
         
-        assert len(state["summaries"]) > 0
-        assert "metadata" in state
+        assert [s["summary"] for s in state.summaries] == ["TLDR: One", "TLDR: Two"]
+        assert state.metadata["summaries_cached"] == 2
+        mock_llm.ainvoke.assert_awaited_once()
     
-    @patch('agent.tools.tavily_tool.TavilyClient')
-    @patch('agent.tools.groq_tool.ChatGroq')
-    def test_store_node(self, mock_groq_class, mock_tavily_class, mock_config, sample_agent_state, sample_summaries):
+    def test_store_node(self, workflow, sample_agent_state, sample_summaries):
         """Test store node."""
-        mock_tavily_client = Mock()
-        mock_tavily_class.return_value = mock_tavily_client
+        state = replace(sample_agent_state)
+        state.summaries = sample_summaries
+        state = workflow.store_node(state)
         
-        mock_llm = Mock()
-        mock_groq_class.return_value = mock_llm
+        assert "articles_stored" in state.metadata
+    
+    def test_store_node_skips_stored_articles(self, workflow, sample_agent_state, sample_summaries):
+        """Test store node only writes articles the store hasn't seen."""
+        workflow.database.store_articles_batch([(1, sample_summaries[0])])
         
-        workflow = BriefingAgentWorkflow()
-        state = sample_agent_state.copy()
-        state["summaries"] = sample_summaries
+        state = replace(sample_agent_state)
+        state.summaries = [dict(item, article_hash=i + 1) for i, item in enumerate(sample_summaries)]
         state = workflow.store_node(state)
         
-        assert "metadata" in state
-        assert "articles_stored" in state["metadata"]
+        assert state.metadata["articles_stored"] == len(sample_summaries) - 1
+        assert workflow.database.check_article_hashes([1, 2]) == [True, True]
     
-    @patch('agent.tools.tavily_tool.TavilyClient')
-    @patch('agent.tools.groq_tool.ChatGroq')
-    def test_format_node(self, mock_groq_class, mock_tavily_class, mock_config, sample_agent_state, sample_summaries):
-        """Test format node."""
-        mock_tavily_client = Mock()
-        mock_tavily_class.return_value = mock_tavily_client
+    def test_store_node_flushes_article_hashes(self, workflow, sample_agent_state, sample_summaries, tmp_path, monkeypatch):
+        """Test the store node writes persisted article hashes once per run."""
+        import config
+        hashes_path = tmp_path / "article_hashes.bin"
+        monkeypatch.setattr(config.config, 'ARTICLE_HASHES_PATH', str(hashes_path))
         
-        mock_llm = Mock()
-        mock_response = Mock()
-        mock_response.content = "<html><body>Email content</body></html>"
-        mock_llm.invoke.return_value = mock_response
-        mock_groq_class.return_value = mock_llm
+        state = replace(sample_agent_state)
+        state.summaries = [dict(item, article_hash=i + 1) for i, item in enumerate(sample_summaries)]
+        workflow.store_node(state)
         
-        workflow = BriefingAgentWorkflow()
-        state = sample_agent_state.copy()
-        state["summaries"] = sample_summaries
+        assert DatabaseTool(hashes_path=str(hashes_path)).check_article_hashes([1, 2, 3]) == [True, True, False]
+    
+    def test_format_node(self, workflow, mock_llm, sample_agent_state, sample_summaries):
+        """Test format node."""
+        mock_llm.with_structured_output.return_value.invoke.return_value = Briefing(
+            greeting="Hello!", items=[], closing="Bye."
+        )
+        
+        state = replace(sample_agent_state)
+        state.summaries = sample_summaries
         state = workflow.format_node(state)
         
-        assert len(state["email_content"]) > 0
-        assert "metadata" in state
+        assert "Hello!" in state.email_content
+        assert state.errors == []
     
-    @patch('agent.tools.tavily_tool.TavilyClient')
-    @patch('agent.tools.groq_tool.ChatGroq')
-    def test_email_node(self, mock_groq_class, mock_tavily_class, mock_config, sample_agent_state, sample_summaries):
+    def test_email_node(self, workflow, sample_agent_state, sample_summaries):
         """Test email node."""
-        mock_tavily_client = Mock()
-        mock_tavily_class.return_value = mock_tavily_client
-        
-        mock_llm = Mock()
-        mock_groq_class.return_value = mock_llm
-        
-        workflow = BriefingAgentWorkflow()
-        state = sample_agent_state.copy()
-        state["summaries"] = sample_summaries
-        state["email_content"] = "<html><body>Test email</body></html>"
+        state = replace(sample_agent_state)
+        state.summaries = sample_summaries
+        state.email_content = "<html><body>Test email</body></html>"
         state = workflow.email_node(state)
         
-        assert "metadata" in state
-        assert "email_sent" in state["metadata"]
+        assert "email_sent" in state.metadata
@@ -0,0 +1,32 @@
+"""Unit tests for the shared AWS session."""
+import pytest
+import agent.tools.aws as aws
+import agent.tools.database_tool as database_tool
+import agent.tools.email_tool as email_tool
+
+
+@pytest.mark.unit
+class TestAwsSession:
+    """Unit tests for the shared boto3 session."""
+    
+    def test_session_created_once(self, mock_config, monkeypatch):
+        """Test every caller gets the same session."""
+        monkeypatch.setattr(aws, '_SESSION', None)
+        
+        session = aws.get_session()
+        
+        assert aws.get_session() is session
+        assert session.region_name == "us-east-1"
+    
+    def test_tools_share_session(self, mock_config, monkeypatch):
+        """Test SES and DynamoDB clients are built from the shared session and config."""
+        monkeypatch.setattr(aws, '_SESSION', None)
+        monkeypatch.setattr(email_tool, '_SES_CLIENT', None)
+        monkeypatch.setattr(database_tool, '_DYNAMODB_RESOURCE', None)
+        
+        ses = email_tool._get_ses_client()
+        dynamodb = database_tool._get_dynamodb_resource()
+        
+        assert ses.meta.config.max_pool_connections == aws.CLIENT_CONFIG.max_pool_connections
+        assert dynamodb.meta.client.meta.config.max_pool_connections == aws.CLIENT_CONFIG.max_pool_connections
+        assert ses.meta.region_name == dynamodb.meta.client.meta.region_name == "us-east-1"
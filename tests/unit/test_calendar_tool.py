@@ -1,9 +1,8 @@
 """Unit tests for CalendarTool."""
 import pytest
-from datetime import datetime
+from datetime import datetime, timezone
 from unittest.mock import patch
-from agent.tools.calendar_tool import CalendarTool
-import pytz
+from agent.tools.calendar_tool import CalendarTool, _tz
 
 
 @pytest.mark.unit
@@ -46,22 +45,14 @@ class TestCalendarTool:
         assert tool.parse_schedule_time("25:00") is None
         assert tool.parse_schedule_time("09:60") is None
     
-    @patch('agent.tools.calendar_tool.datetime')
-    def test_validate_send_time_within_tolerance(self, mock_datetime):
+    def test_validate_send_time_within_tolerance(self):
         """Test time validation when within tolerance."""
         tool = CalendarTool()
         
-        # Mock current time to be 5 minutes before scheduled time
-        mock_now = datetime(2024, 1, 15, 9, 5, 0, tzinfo=pytz.UTC)
-        mock_datetime.now.return_value = mock_now
+        # Current time is 5 minutes after the scheduled time
+        now = datetime(2024, 1, 15, 9, 5, 0, tzinfo=_tz("America/New_York"))
         
-        # Create a timezone-aware datetime for comparison
-        tz = pytz.timezone("America/New_York")
-        scheduled = datetime(2024, 1, 15, 9, 0, 0)
-        scheduled = tz.localize(scheduled)
-        
-        # Mock the get_current_time_in_timezone to return our mock time
-        with patch.object(tool, 'get_current_time_in_timezone', return_value=scheduled.replace(minute=5)):
+        with patch.object(tool, 'get_current_time_in_timezone', return_value=now):
             result = tool.validate_send_time("America/New_York", "09:00", tolerance_minutes=15)
             # Should be valid if within 15 minute tolerance
             assert result is True
@@ -73,3 +64,13 @@ class TestCalendarTool:
         with patch.object(tool, 'get_current_time_in_timezone', side_effect=Exception("Test error")):
             result = tool.validate_send_time("America/New_York", "09:00")
             assert result is True
+    
+    def test_validate_send_time_outside_tolerance(self):
+        """Test time validation rejects times outside the tolerance window."""
+        tool = CalendarTool()
+        now = datetime(2024, 1, 15, 9, 20, 30, tzinfo=timezone.utc)
+        
+        with patch.object(tool, 'get_current_time_in_timezone', return_value=now):
+            assert tool.validate_send_time("UTC", "09:00", tolerance_minutes=15) is False
+            assert tool.validate_send_time("UTC", "09:10", tolerance_minutes=15) is True
+            assert tool.validate_send_time("UTC", "09:36", tolerance_minutes=15) is False
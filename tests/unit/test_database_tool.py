@@ -1,7 +1,39 @@
 """Unit tests for DatabaseTool."""
+import os
+import boto3
 import pytest
+from moto import mock_aws
 from unittest.mock import Mock, patch
-from agent.tools.database_tool import DatabaseTool
+from agent.tools.database_tool import DatabaseTool, _article_id_hash
+
+
+@pytest.fixture
+def dynamodb_tables(monkeypatch):
+    """Moto-backed DynamoDB tables with DYNAMODB_ENABLED turned on."""
+    import config
+    monkeypatch.setattr(config.config, 'DYNAMODB_ENABLED', True)
+    
+    with mock_aws():
+        dynamodb = boto3.resource('dynamodb', region_name="us-east-1")
+        dynamodb.create_table(
+            TableName="news_articles",
+            KeySchema=[{"AttributeName": "article_hash", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "article_hash", "AttributeType": "N"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        dynamodb.create_table(
+            TableName="user_summaries",
+            KeySchema=[
+                {"AttributeName": "user_email", "KeyType": "HASH"},
+                {"AttributeName": "article_id", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "user_email", "AttributeType": "S"},
+                {"AttributeName": "article_id", "AttributeType": "S"},
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield dynamodb
 
 
 @pytest.mark.unit
@@ -26,12 +58,13 @@ class TestDatabaseTool:
         
         # Same article should produce same hash
         assert hash1 == hash2
-        assert len(hash1) == 64  # SHA256 produces 64 char hex string
+        assert isinstance(hash1, int)
+        assert 0 <= hash1 < 2 ** 64  # xxh3_64 produces a 64-bit integer
     
     def test_check_article_hash_not_exists(self, mock_config):
         """Test checking non-existent article hash."""
         tool = DatabaseTool()
-        assert tool.check_article_hash("nonexistent_hash") is False
+        assert tool.check_article_hash(12345) is False
     
     def test_check_article_hash_exists(self, mock_config):
         """Test checking existing article hash."""
@@ -73,7 +106,7 @@ class TestDatabaseTool:
         
         tool.mark_sent_to_user(user_email, article_id)
         assert user_email in tool.user_history
-        assert article_id in tool.user_history[user_email]
+        assert _article_id_hash(article_id) in tool.user_history[user_email]
     
     def test_deduplication_workflow(self, mock_config):
         """Test complete deduplication workflow."""
@@ -94,3 +127,185 @@ class TestDatabaseTool:
         # Second time: should be duplicate
         assert tool.check_article_hash(article_hash) is True
         assert tool.check_user_history(user_email, article_id) is True
+    
+    def test_store_articles_batch(self, mock_config):
+        """Test storing many articles at once."""
+        tool = DatabaseTool()
+        articles = [{"title": f"Test {i}", "url": f"https://example.com/{i}"} for i in range(3)]
+        hashes = [tool.get_article_hash(article) for article in articles]
+        
+        tool.store_articles_batch(list(zip(hashes, articles)))
+        assert all(tool.check_article_hash(h) for h in hashes)
+    
+    def test_article_hashes_persist_across_instances(self, mock_config, tmp_path):
+        """Test in-memory article hashes are reloaded from hashes_path by a new tool."""
+        hashes_path = str(tmp_path / "article_hashes.bin")
+        articles = [{"title": f"Test {i}", "url": f"https://example.com/{i}"} for i in range(3)]
+        
+        tool = DatabaseTool(hashes_path=hashes_path)
+        hashes = tool.get_article_hashes(articles)
+        tool.store_articles_batch(list(zip(hashes, articles)))
+        assert not os.path.exists(hashes_path)  # buffered until flush()
+        tool.flush()
+        
+        reloaded = DatabaseTool(hashes_path=hashes_path)
+        assert reloaded.article_hashes == {}
+        assert reloaded.check_article_hashes(hashes + [12345]) == [True, True, True, False]
+        assert reloaded.check_article_hash(hashes[0]) is True
+    
+    def test_concurrent_flushes(self, mock_config, tmp_path):
+        """Test concurrent flushes leave one complete file and no temp files behind."""
+        from concurrent.futures import ThreadPoolExecutor
+        hashes_path = str(tmp_path / "article_hashes.bin")
+        tool = DatabaseTool(hashes_path=hashes_path)
+        
+        def store_and_flush(i):
+            tool.store_articles_batch([(i, {"title": f"Test {i}"})])
+            tool.flush()
+        
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(store_and_flush, range(1, 33)))
+        
+        assert os.listdir(tmp_path) == ["article_hashes.bin"]
+        reloaded = DatabaseTool(hashes_path=hashes_path)
+        assert reloaded.check_article_hashes(list(range(1, 33))) == [True] * 32
+    
+    def test_mark_sent_batch(self, mock_config):
+        """Test marking many articles as sent at once."""
+        tool = DatabaseTool()
+        tool.mark_sent_batch("user@example.com", ["article_1", "article_2"])
+        
+        assert tool.check_user_history("user@example.com", "article_1") is True
+        assert tool.check_user_history("user@example.com", "article_2") is True
+        assert tool.check_user_history("user@example.com", "article_3") is False
+    
+    def test_check_article_hashes(self, mock_config):
+        """Test bulk hashing and checking match the single-article API."""
+        tool = DatabaseTool()
+        articles = [{"title": f"Test {i}", "url": f"https://example.com/{i}"} for i in range(4)]
+        hashes = tool.get_article_hashes(articles)
+        assert hashes == [tool.get_article_hash(article) for article in articles]
+        
+        tool.store_articles_batch([(hashes[1], articles[1]), (hashes[3], articles[3])])
+        
+        assert tool.check_article_hashes(hashes) == [False, True, False, True]
+        assert tool.check_article_hashes([]) == []
+    
+    def test_check_user_history_batch(self, mock_config):
+        """Test batched user-history checks match the single-article API."""
+        tool = DatabaseTool()
+        assert tool.check_user_history_batch("user@example.com", ["article_1"]) == [False]
+        
+        tool.mark_sent_batch("user@example.com", ["article_1"])
+        assert tool.check_user_history_batch(
+            "user@example.com", ["article_1", "article_2"]
+        ) == [True, False]
+
+
+@pytest.mark.unit
+class TestDatabaseToolDynamoDB:
+    """Unit tests for DatabaseTool backed by (moto) DynamoDB."""
+    
+    def test_store_articles_batch_persists(self, mock_config, dynamodb_tables):
+        """Test batched writes are visible to a fresh tool instance."""
+        tool = DatabaseTool()
+        assert tool.use_dynamodb is True
+        
+        # More than one 25-item BatchWriteItem request
+        articles = [{"title": f"Test {i}", "url": f"https://example.com/{i}"} for i in range(30)]
+        hashes = [tool.get_article_hash(article) for article in articles]
+        tool.store_articles_batch(list(zip(hashes, articles)))
+        
+        fresh_tool = DatabaseTool()
+        assert all(fresh_tool.check_article_hash(h) for h in hashes)
+        assert fresh_tool.check_article_hash(fresh_tool.get_article_hash({"title": "New"})) is False
+    
+    def test_mark_sent_batch_persists(self, mock_config, dynamodb_tables):
+        """Test sent history is visible to a fresh tool instance."""
+        tool = DatabaseTool()
+        tool.mark_sent_batch("user@example.com", ["article_1", "article_2"])
+        
+        fresh_tool = DatabaseTool()
+        assert fresh_tool.check_user_history("user@example.com", "article_1") is True
+        assert fresh_tool.check_user_history("user@example.com", "article_3") is False
+        assert fresh_tool.check_user_history("other@example.com", "article_1") is False
+    
+    def test_check_article_hashes_batch_get(self, mock_config, dynamodb_tables):
+        """Test bulk checks resolve unknown hashes with BatchGetItem, without scanning the table."""
+        tool = DatabaseTool()
+        articles = [{"title": f"Test {i}", "url": f"https://example.com/{i}"} for i in range(120)]
+        hashes = tool.get_article_hashes(articles)
+        tool.store_articles_batch(list(zip(hashes[:110], articles[:110])))
+        
+        fresh_tool = DatabaseTool()
+        with patch.object(fresh_tool.articles_table, "scan") as mock_scan:
+            assert fresh_tool.check_article_hashes(hashes) == [True] * 110 + [False] * 10
+        mock_scan.assert_not_called()
+        
+        # Confirmed hashes are remembered; only the unknown ones are looked up again
+        with patch.object(fresh_tool, "_batch_get", return_value=[]) as mock_batch_get:
+            assert fresh_tool.check_article_hashes(hashes) == [True] * 110 + [False] * 10
+        assert len(mock_batch_get.call_args.args[1]) == 10
+    
+    def test_batch_get_retries_unprocessed_keys_with_backoff(self, mock_config, dynamodb_tables):
+        """Test unprocessed BatchGetItem keys are resubmitted after a backoff sleep."""
+        tool = DatabaseTool()
+        table = tool.articles_table.name
+        keys = [{"article_hash": 1}, {"article_hash": 2}]
+        responses = [
+            {"Responses": {table: [{"article_hash": 1}]}, "UnprocessedKeys": {table: {"Keys": keys[1:]}}},
+            {"Responses": {table: [{"article_hash": 2}]}, "UnprocessedKeys": {}},
+        ]
+        with patch.object(tool.dynamodb, "batch_get_item", side_effect=responses) as mock_batch_get, \
+                patch("agent.tools.database_tool.time.sleep") as mock_sleep:
+            items = tool._batch_get(tool.articles_table, keys, "article_hash")
+        
+        assert items == [{"article_hash": 1}, {"article_hash": 2}]
+        assert mock_batch_get.call_args.kwargs["RequestItems"] == {table: {"Keys": keys[1:]}}
+        mock_sleep.assert_called_once()
+    
+    def test_batch_get_gives_up_after_max_attempts(self, mock_config, dynamodb_tables):
+        """Test keys that stay unprocessed raise instead of looping forever."""
+        from agent.tools.database_tool import _BATCH_GET_MAX_ATTEMPTS
+        tool = DatabaseTool()
+        table = tool.articles_table.name
+        keys = [{"article_hash": 1}]
+        throttled = {"Responses": {}, "UnprocessedKeys": {table: {"Keys": keys}}}
+        with patch.object(tool.dynamodb, "batch_get_item", return_value=throttled) as mock_batch_get, \
+                patch("agent.tools.database_tool.time.sleep") as mock_sleep:
+            with pytest.raises(RuntimeError, match="unprocessed"):
+                tool._batch_get(tool.articles_table, keys, "article_hash")
+        
+        assert mock_batch_get.call_count == _BATCH_GET_MAX_ATTEMPTS
+        assert mock_sleep.call_count == _BATCH_GET_MAX_ATTEMPTS - 1
+        assert all(call.args[0] <= 2.0 for call in mock_sleep.call_args_list)
+    
+    def test_check_user_history_batch_queries_unknown_ids(self, mock_config, dynamodb_tables):
+        """Test batched user-history checks look up unknown ids without loading the whole history."""
+        tool = DatabaseTool()
+        tool.mark_sent_batch("user@example.com", ["article_1", "article_2"])
+        
+        fresh_tool = DatabaseTool()
+        with patch.object(fresh_tool.user_summaries_table, "query") as mock_query:
+            assert fresh_tool.check_user_history_batch(
+                "user@example.com", ["article_1", "article_3", "article_2", "article_4"]
+            ) == [True, False, True, False]
+        mock_query.assert_not_called()
+        
+        # Confirmed ids are remembered; only the unsent ones are looked up again
+        with patch.object(fresh_tool, "_batch_get", return_value=[]) as mock_batch_get:
+            fresh_tool.check_user_history_batch("user@example.com", ["article_1", "article_3"])
+        assert mock_batch_get.call_args.args[1] == [{"user_email": "user@example.com", "article_id": "article_3"}]
+    
+    def test_check_user_history_get_item(self, mock_config, dynamodb_tables):
+        """Test single user-history checks use GetItem and remember confirmed ids."""
+        tool = DatabaseTool()
+        tool.mark_sent_to_user("user@example.com", "article_1")
+        
+        fresh_tool = DatabaseTool()
+        assert fresh_tool.check_user_history("user@example.com", "article_1") is True
+        assert fresh_tool.check_user_history("user@example.com", "article_2") is False
+        
+        with patch.object(fresh_tool.user_summaries_table, "get_item") as mock_get_item:
+            assert fresh_tool.check_user_history("user@example.com", "article_1") is True
+        mock_get_item.assert_not_called()
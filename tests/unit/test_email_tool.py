@@ -45,3 +45,107 @@ class TestEmailTool:
         
         assert result["status"] == "logged"
         assert result["message_id"] is not None
+    
+    def test_send_emails_bulk_reuses_smtp_connection(self, mock_config, monkeypatch):
+        """Test that bulk SMTP sends log in once and reuse the connection."""
+        import agent.tools.email_tool as email_tool
+        monkeypatch.setattr(email_tool.config, 'SMTP_PORT', 587)
+        
+        tool = EmailTool()
+        tool.use_real_ses = False
+        tool.use_smtp = True
+        
+        with patch("agent.tools.email_tool.smtplib.SMTP") as mock_smtp:
+            server = mock_smtp.return_value
+            results = tool.send_emails_bulk([
+                (f"user{i}@example.com", "Briefing", "<p>Hello</p>", None)
+                for i in range(3)
+            ])
+        
+        assert [r["method"] for r in results] == ["smtp"] * 3
+        mock_smtp.assert_called_once()
+        server.starttls.assert_called_once()
+        server.login.assert_called_once()
+        assert server.send_message.call_count == 3
+    
+    def test_smtp_setup_failure_closes_socket(self, mock_config, monkeypatch):
+        """Test a failed login closes the new connection instead of leaking it."""
+        import smtplib
+        import agent.tools.email_tool as email_tool
+        monkeypatch.setattr(email_tool.config, 'SMTP_PORT', 587)
+        
+        tool = EmailTool()
+        tool.use_real_ses = False
+        tool.use_smtp = True
+        
+        with patch("agent.tools.email_tool.smtplib.SMTP") as mock_smtp:
+            server = mock_smtp.return_value
+            server.login.side_effect = smtplib.SMTPAuthenticationError(535, b"bad credentials")
+            result = tool.send_email("user@example.com", "Briefing", "<p>Hello</p>")
+        
+        assert result["method"] != "smtp"
+        assert mock_smtp.call_args.kwargs["timeout"] == email_tool.config.SMTP_TIMEOUT
+        server.close.assert_called_once()
+        assert tool._smtp is None
+    
+    def test_send_email_smtp_delivers(self, mock_config, smtp_sink):
+        """Test a real SMTP conversation (STARTTLS, login, send) against a local server."""
+        tool = EmailTool()
+        assert tool.use_smtp is True
+        
+        result = tool.send_email(
+            to="recipient@example.com",
+            subject="Briefing",
+            html_content="<p>Hello</p>"
+        )
+        tool.close()
+        
+        assert result["status"] == "sent"
+        assert result["method"] == "smtp"
+        envelope, = smtp_sink.envelopes
+        assert envelope.rcpt_tos == ["recipient@example.com"]
+        assert b"Subject: Briefing" in envelope.content
+    
+    def test_send_emails_bulk_smtp_single_connection(self, mock_config, smtp_sink):
+        """Test that a bulk send delivers every message over one SMTP connection."""
+        tool = EmailTool()
+        
+        results = tool.send_emails_bulk([
+            (f"user{i}@example.com", "Briefing", "<p>Hello</p>", None)
+            for i in range(3)
+        ])
+        tool.close()
+        
+        assert [r["method"] for r in results] == ["smtp"] * 3
+        assert [e.rcpt_tos for e in smtp_sink.envelopes] == [[f"user{i}@example.com"] for i in range(3)]
+        assert len(smtp_sink.peers) == 1
+    
+    def test_persist_email_writes_files(self, mock_config):
+        """Test that mock sends write the .eml and .html files to the temp folder."""
+        tool = EmailTool()
+        html = "<html><body>Café news</body></html>"
+        
+        result = tool._send_email_mock("recipient@example.com", "Bytes Test", html)
+        tool.close()
+        
+        with open(result["html_path"], "rb") as f:
+            assert f.read() == html.encode("utf-8")
+        with open(result["eml_path"], "rb") as f:
+            assert b"Subject: Bytes Test" in f.read()
+    
+    def test_broadcast_builds_message_template_once(self, mock_config):
+        """Test that sending one body to many recipients converts HTML to text once."""
+        tool = EmailTool()
+        tool.use_real_ses = False
+        
+        with patch("agent.tools.email_tool._html_to_text", return_value="Hello") as mock_to_text:
+            results = tool.send_emails_bulk([
+                (f"user{i}@example.com", "Briefing", "<p>Hello</p>", None)
+                for i in range(3)
+            ])
+        tool.close()
+        
+        mock_to_text.assert_called_once()
+        assert len({r["message_id"].rsplit("-", 1)[1] for r in results}) == 1
+        with open(results[2]["eml_path"], "rb") as f:
+            assert b"To: user2@example.com" in f.read()
@@ -1,7 +1,9 @@
 """Unit tests for GroqTool."""
+import asyncio
+from types import SimpleNamespace
 import pytest
-from unittest.mock import Mock, patch, MagicMock
-from agent.tools.groq_tool import GroqTool
+from unittest.mock import AsyncMock, Mock, patch, MagicMock
+from agent.tools.groq_tool import Briefing, BriefingItem, GroqTool
 
 
 @pytest.mark.unit
@@ -26,12 +28,37 @@ class TestGroqTool:
                 with pytest.raises(ValueError, match="GROQ_API_KEY not configured"):
                     GroqTool()
     
+    @patch('agent.tools.groq_tool.ChatGroq')
+    def test_call_llm_retries_transient_errors(self, mock_chatgroq_class, mock_config):
+        """Test transient errors are retried with backoff."""
+        mock_llm = Mock()
+        mock_llm.invoke.side_effect = [ConnectionError("reset"), SimpleNamespace(content="ok")]
+        mock_chatgroq_class.return_value = mock_llm
+        
+        tool = GroqTool()
+        tool.base_delay = 0
+        
+        assert tool._call_llm_with_retry([]) == "ok"
+        assert mock_llm.invoke.call_count == 2
+    
+    @patch('agent.tools.groq_tool.ChatGroq')
+    def test_call_llm_fails_fast_on_non_retryable_errors(self, mock_chatgroq_class, mock_config):
+        """Test non-transient errors (bad config, auth) are not retried."""
+        mock_llm = Mock()
+        mock_llm.invoke.side_effect = ValueError("invalid api key")
+        mock_chatgroq_class.return_value = mock_llm
+        
+        tool = GroqTool()
+        
+        with pytest.raises(ValueError):
+            tool._call_llm_with_retry([])
+        mock_llm.invoke.assert_called_once()
+    
     @patch('agent.tools.groq_tool.ChatGroq')
     def test_analyze_preferences(self, mock_chatgroq_class, mock_config):
         """Test preference analysis."""
         mock_llm = Mock()
-        mock_response = Mock()
-        mock_response.content = "AI news\ntechnology trends"
+        mock_response = SimpleNamespace(content="AI news\ntechnology trends")
         mock_llm.invoke.return_value = mock_response
         mock_chatgroq_class.return_value = mock_llm
         
@@ -70,12 +97,24 @@ class TestGroqTool:
         assert len(queries) == 2
         assert "AI" in queries[0] or "technology" in queries[0]
     
+    @patch('agent.tools.groq_tool.ChatGroq')
+    def test_generate_search_queries_raises_on_error(self, mock_chatgroq_class, mock_config):
+        """Test query generation surfaces LLM failures instead of faking queries."""
+        mock_llm = Mock()
+        mock_llm.invoke.side_effect = Exception("API Error")
+        mock_chatgroq_class.return_value = mock_llm
+        
+        tool = GroqTool()
+        preferences = {"topics": ["AI", "technology"]}
+        
+        with pytest.raises(Exception, match="API Error"):
+            tool.generate_search_queries(preferences)
+    
     @patch('agent.tools.groq_tool.ChatGroq')
     def test_summarize_article(self, mock_chatgroq_class, mock_config):
         """Test article summarization."""
         mock_llm = Mock()
-        mock_response = Mock()
-        mock_response.content = "TLDR: Major breakthrough in AI research"
+        mock_response = SimpleNamespace(content="TLDR: Major breakthrough in AI research")
         mock_llm.invoke.return_value = mock_response
         mock_chatgroq_class.return_value = mock_llm
         
@@ -106,21 +145,128 @@ class TestGroqTool:
         assert summary == "Test Article"
     
     @patch('agent.tools.groq_tool.ChatGroq')
-    def test_generate_email_content(self, mock_chatgroq_class, mock_config, sample_summaries):
-        """Test email content generation."""
+    def test_summarize_articles_batch(self, mock_chatgroq_class, mock_config, sample_articles):
+        """Test batched summarization with a single LLM call."""
         mock_llm = Mock()
-        mock_response = Mock()
-        mock_response.content = "<html><body><h2>Your Briefing</h2><p>Content</p></body></html>"
+        mock_response = SimpleNamespace(content='[{"index": 1, "summary": "Tech shifts."}, {"index": 0, "summary": "NLP leaps."}]')
         mock_llm.invoke.return_value = mock_response
         mock_chatgroq_class.return_value = mock_llm
         
+        tool = GroqTool()
+        summaries = tool.summarize_articles_batch(sample_articles)
+        
+        assert summaries == ["NLP leaps.", "Tech shifts."]
+        mock_llm.invoke.assert_called_once()
+    
+    @patch('agent.tools.groq_tool.ChatGroq')
+    def test_summarize_articles_batch_fallback(self, mock_chatgroq_class, mock_config, sample_articles):
+        """Test batched summarization fallback on non-JSON output."""
+        mock_llm = Mock()
+        mock_response = SimpleNamespace(content="NLP leaps.")
+        mock_llm.invoke.return_value = mock_response
+        mock_chatgroq_class.return_value = mock_llm
+        
+        tool = GroqTool()
+        summaries = tool.summarize_articles_batch(sample_articles)
+        
+        # Lines are used in order; missing summaries fall back to the title
+        assert summaries == ["NLP leaps.", sample_articles[1]["title"]]
+    
+    @patch('agent.tools.groq_tool.ChatGroq')
+    def test_summarize_articles_batch_retries_each_batch(self, mock_chatgroq_class, mock_config, sample_articles):
+        """Test multi-batch summarization retries a failed batch without failing the others."""
+        attempts = {}
+        
+        def invoke(messages, **kwargs):
+            title = "NLP" if "Natural Language" in messages[-1].content else "Trends"
+            attempts[title] = attempts.get(title, 0) + 1
+            if title == "Trends" and attempts[title] == 1:
+                raise ConnectionError("reset")
+            return SimpleNamespace(content=f'{{"summaries": [{{"index": 0, "summary": "{title}."}}]}}')
+        
+        mock_llm = Mock()
+        mock_llm.invoke.side_effect = invoke
+        mock_chatgroq_class.return_value = mock_llm
+        
+        tool = GroqTool()
+        tool.base_delay = 0
+        summaries = tool.summarize_articles_batch(sample_articles, batch_size=1)
+        
+        assert summaries == ["NLP.", "Trends."]
+        assert attempts == {"NLP": 1, "Trends": 2}
+        assert mock_llm.invoke.call_args.kwargs["max_tokens"] == 80
+    
+    @patch('agent.tools.groq_tool.ChatGroq')
+    def test_summarize_articles_batch_malformed_item(self, mock_chatgroq_class, mock_config, sample_articles):
+        """Test a malformed JSON item falls back to its title without discarding the others."""
+        mock_llm = Mock()
+        mock_llm.invoke.return_value = SimpleNamespace(
+            content='{"summaries": [{"index": 0, "summary": "NLP leaps."}, {"index": "one", "text": "?"}]}'
+        )
+        mock_chatgroq_class.return_value = mock_llm
+        
+        tool = GroqTool()
+        summaries = tool.summarize_articles_batch(sample_articles)
+        
+        assert summaries == ["NLP leaps.", sample_articles[1]["title"]]
+    
+    @patch('agent.tools.groq_tool.ChatGroq')
+    def test_asummarize_articles(self, mock_chatgroq_class, mock_config, sample_articles):
+        """Test async summarization fans batches out concurrently."""
+        mock_llm = Mock()
+        mock_llm.ainvoke = AsyncMock(side_effect=[
+            SimpleNamespace(content='[{"index": 0, "summary": "NLP leaps."}]'),
+            ValueError("API Error"),
+        ])
+        mock_chatgroq_class.return_value = mock_llm
+        
+        tool = GroqTool()
+        summaries = asyncio.run(tool.asummarize_articles(sample_articles, batch_size=1))
+        
+        # Failed batch falls back to the article title
+        assert summaries == ["NLP leaps.", sample_articles[1]["title"]]
+        assert mock_llm.ainvoke.await_count == 2
+    
+    @patch('agent.tools.groq_tool.ChatGroq')
+    def test_summarize_articles_batch_json_mode(self, mock_chatgroq_class, mock_config, sample_articles):
+        """Test batched summaries request Groq JSON mode and parse the wrapping object."""
+        mock_llm = Mock()
+        mock_llm.invoke.return_value = Mock(
+            content='{"summaries": [{"index": 1, "summary": "Trends shift."}, {"index": 0, "summary": "NLP leaps."}]}'
+        )
+        mock_chatgroq_class.return_value = mock_llm
+        
+        tool = GroqTool()
+        summaries = tool.summarize_articles_batch(sample_articles)
+        
+        assert summaries == ["NLP leaps.", "Trends shift."]
+        assert mock_llm.invoke.call_args.kwargs["response_format"] == {"type": "json_object"}
+        assert mock_llm.invoke.call_args.kwargs["max_tokens"] == 80 * len(sample_articles)
+    
+    @patch('agent.tools.groq_tool.ChatGroq')
+    def test_generate_email_content(self, mock_chatgroq_class, mock_config, sample_summaries):
+        """Test email content generation renders structured LLM output."""
+        mock_llm = Mock()
+        mock_llm.with_structured_output.return_value.invoke.return_value = Briefing(
+            greeting="Good morning!",
+            items=[BriefingItem(index=0, blurb="A <b>bold</b> new model.")],
+            closing="See you tomorrow.",
+        )
+        mock_chatgroq_class.return_value = mock_llm
+        
         tool = GroqTool()
         preferences = {"topics": ["AI"]}
         html = tool.generate_email_content(sample_summaries, preferences)
         
         assert isinstance(html, str)
-        assert "<html" in html.lower() or "<body" in html.lower()
-        mock_llm.invoke.assert_called_once()
+        assert html.startswith("<html><body>")
+        assert "Good morning!" in html and "See you tomorrow." in html
+        # LLM text is escaped; articles without a blurb keep their summary
+        assert "A &lt;b&gt;bold&lt;/b&gt; new model." in html
+        assert sample_summaries[1]["summary"] in html
+        assert f'href="{sample_summaries[0]["url"]}"' in html
+        mock_llm.with_structured_output.return_value.invoke.assert_called_once()
+        mock_llm.invoke.assert_not_called()
     
     @patch('agent.tools.groq_tool.ChatGroq')
     def test_generate_email_content_empty_summaries(self, mock_chatgroq_class, mock_config):
@@ -137,13 +283,23 @@ class TestGroqTool:
     def test_generate_email_content_fallback(self, mock_chatgroq_class, mock_config, sample_summaries):
         """Test email generation fallback."""
         mock_llm = Mock()
-        mock_llm.invoke.side_effect = Exception("API Error")
+        mock_llm.with_structured_output.return_value.invoke.side_effect = Exception("API Error")
         mock_chatgroq_class.return_value = mock_llm
         
         tool = GroqTool()
+        tool.base_delay = 0
         html = tool.generate_email_content(sample_summaries, {})
         
         # Should have fallback HTML structure
         assert "<html>" in html
         assert "<body>" in html
         assert "Your Daily Briefing" in html
+    
+    @patch('agent.tools.groq_tool.ChatGroq')
+    def test_chat_groq_client_is_shared(self, mock_chatgroq_class, mock_config):
+        """Test GroqTool instances with the same settings share one ChatGroq client."""
+        first = GroqTool()
+        second = GroqTool()
+        
+        assert first.llm is second.llm
+        mock_chatgroq_class.assert_called_once()
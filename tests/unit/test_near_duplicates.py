@@ -0,0 +1,36 @@
+"""Unit tests for NearDuplicateFilter."""
+import pytest
+from agent.near_duplicates import NearDuplicateFilter
+
+
+@pytest.mark.unit
+class TestNearDuplicateFilter:
+    """Unit tests for NearDuplicateFilter."""
+    
+    def test_drops_same_story_keeps_best_score(self):
+        """Test that a re-hosted copy of a story is dropped in favor of the higher-scored one."""
+        story = "OpenAI releases new reasoning model with improved math benchmarks"
+        articles = [
+            {"title": story, "url": "https://a.example.com/1", "content": story, "score": 0.5},
+            {"title": "Chip exports tighten", "url": "https://b.example.com/2", "content": "Trade rules change", "score": 0.7},
+            {"title": story, "url": "https://c.example.com/3", "content": story, "score": 0.9},
+        ]
+        
+        kept = NearDuplicateFilter(threshold=0.9).filter(articles)
+        
+        assert [a["url"] for a in kept] == ["https://b.example.com/2", "https://c.example.com/3"]
+    
+    def test_remembers_earlier_batches(self):
+        """Test that later batches are compared against articles kept earlier in the run."""
+        article = {"title": "Mars rover finds water ice", "content": "NASA confirms discovery", "url": "https://a.example.com"}
+        near_duplicates = NearDuplicateFilter()
+        
+        assert near_duplicates.filter([article]) == [article]
+        assert near_duplicates.filter([{**article, "url": "https://b.example.com"}]) == []
+        assert near_duplicates.filter([]) == []
+    
+    def test_threshold_above_one_disables_filter(self):
+        """Test that a threshold above 1.0 keeps identical articles."""
+        article = {"title": "Same", "content": "Same", "url": "https://a.example.com"}
+        
+        assert len(NearDuplicateFilter(threshold=1.01).filter([article, dict(article)])) == 2
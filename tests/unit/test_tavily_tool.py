@@ -1,4 +1,7 @@
 """Unit tests for TavilyTool."""
+import asyncio
+import threading
+import time
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 from agent.tools.tavily_tool import TavilyTool
@@ -37,7 +40,9 @@ class TestTavilyTool:
         assert results[0]["title"] == "AI Breakthrough in Natural Language Processing"
         assert "url" in results[0]
         assert "content" in results[0]
+        assert "raw_content" not in results[0]
         mock_client.search.assert_called_once()
+        assert mock_client.search.call_args.kwargs["include_raw_content"] is False
     
     @patch('agent.tools.tavily_tool.TavilyClient')
     def test_search_news_empty_results(self, mock_client_class, mock_config):
@@ -85,3 +90,50 @@ class TestTavilyTool:
         
         assert mock_client.search.call_count == 3
         assert mock_sleep.call_count == 2
+    
+    @patch('agent.tools.tavily_tool.TavilyClient')
+    def test_asearch_news_bounded_concurrency(self, mock_client_class, mock_config):
+        """Test concurrent searches never exceed MAX_CONCURRENT_SEARCHES in flight."""
+        lock = threading.Lock()
+        in_flight, peak = 0, 0
+        
+        def search(query, **kwargs):
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.02)
+            with lock:
+                in_flight -= 1
+            return {"results": []}
+        
+        mock_client_class.return_value = Mock(search=Mock(side_effect=search))
+        
+        tool = TavilyTool()
+        
+        async def search_all():
+            await asyncio.gather(*(tool.asearch_news(f"q{i}") for i in range(6)))
+        
+        with patch('config.config.MAX_CONCURRENT_SEARCHES', 2):
+            asyncio.run(search_all())
+            # A fresh event loop gets its own semaphore
+            asyncio.run(search_all())
+        
+        assert peak == 2
+    
+    @patch('agent.tools.tavily_tool.TavilyClient')
+    @patch('time.sleep')
+    def test_search_news_no_retry_on_invalid_key(self, mock_sleep, mock_client_class, mock_config):
+        """Test that permanent errors are raised without retrying."""
+        from tavily import InvalidAPIKeyError
+        mock_client = Mock()
+        mock_client_class.return_value = mock_client
+        mock_client.search.side_effect = InvalidAPIKeyError("bad key")
+        
+        tool = TavilyTool()
+        
+        with pytest.raises(InvalidAPIKeyError):
+            tool.search_news("test query")
+        
+        assert mock_client.search.call_count == 1
+        mock_sleep.assert_not_called()